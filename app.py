@@ -6,26 +6,36 @@ Sem threading problemático, com tratamento robusto de erros
 
 from flask import Flask, request, jsonify, render_template, send_file
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import os
+import shutil
+import hashlib
 import uuid
-import json
 import time
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import traceback
 import logging
+import atexit
+import multiprocessing
+from functools import cache
+from dataclasses import asdict, replace
+from concurrent.futures import ProcessPoolExecutor
 
 # Configuração estável
 from config_stable import config
 
 # Imports MVP (com tratamento de erro)
 try:
-    from mvp.models import db, Session, ProcessedDocument, ProcessingLog
+    from mvp.models import db, register_sqlite_pragmas, upgrade_json_columns, Session, ProcessedDocument, ProcessingLog, OCRCache
     from mvp.utils.logging_helper import SessionLogger
+    from mvp.utils.hashing import file_digest
     from mvp.parsers.transcription import BasicTranscriptionParser
-    from mvp.processors.ocr import BasicOCR
+    from mvp.processors.ocr import BasicOCR, ocr_result_from_dict
     from mvp.processors.correlator import BasicCorrelator
-    from mvp.generators.ai_client import AIDocumentGenerator
+    from mvp.generators.ai_client import get_cached_generator
     from mvp.generators.formatter import DocumentFormatter
 except ImportError as e:
     logging.error(f"Erro ao importar módulos MVP: {e}")
@@ -45,7 +55,9 @@ def create_stable_app(config_name='stable'):
     # Criar tabelas
     with app.app_context():
         try:
+            register_sqlite_pragmas()
             db.create_all()
+            upgrade_json_columns()
             logging.info("Database inicializado com sucesso")
         except Exception as e:
             logging.error(f"Erro ao criar database: {e}")
@@ -56,59 +68,216 @@ def create_stable_app(config_name='stable'):
 # Criar aplicação
 app = create_stable_app()
 
-# Inicializar processadores (lazy loading para estabilidade)
-_transcription_parser = None
-_ocr_processor = None
-_correlator = None
-_formatter = None
-_ai_generator = None
-
+# Inicializar processadores (lazy loading para estabilidade; uma instância por processo)
+@cache
 def get_transcription_parser():
-    global _transcription_parser
-    if _transcription_parser is None:
-        _transcription_parser = BasicTranscriptionParser()
-    return _transcription_parser
+    return BasicTranscriptionParser()
 
+@cache
 def get_ocr_processor():
-    global _ocr_processor
-    if _ocr_processor is None:
-        _ocr_processor = BasicOCR()
-    return _ocr_processor
+    return BasicOCR()
 
+@cache
 def get_correlator():
-    global _correlator
-    if _correlator is None:
-        _correlator = BasicCorrelator()
-    return _correlator
+    return BasicCorrelator()
 
+@cache
 def get_formatter():
-    global _formatter
-    if _formatter is None:
-        _formatter = DocumentFormatter()
-    return _formatter
+    return DocumentFormatter()
+
+# Processos dos pools criados via forkserver (spawn onde não existe): um fork direto
+# deste processo, já com threads do servidor, copiaria locks presos e conexões abertas.
+# Cada worker importa este módulo uma vez ao iniciar (os pools são persistentes).
+_POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+# OCR em processos separados: sem disputa pelo GIL e sem compartilhar a API do Tesseract
+OCR_PROCESS_WORKERS = int(os.getenv('MVP_OCR_PROCESSES', os.cpu_count() or 1))
+_ocr_pool = None
+_worker_ocr = None
+
+def _init_ocr_worker():
+    """Inicializador dos processos de OCR: um thread do Tesseract por processo"""
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+def _ocr_batch(paths):
+    """Executa OCR de um lote de imagens no processo worker"""
+    global _worker_ocr
+    if _worker_ocr is None:
+        _worker_ocr = BasicOCR()
+    return _worker_ocr.extract_text_batch(paths)
+
+def get_ocr_pool():
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ProcessPoolExecutor(
+            max_workers=OCR_PROCESS_WORKERS, initializer=_init_ocr_worker, mp_context=_POOL_CONTEXT
+        )
+        atexit.register(_ocr_pool.shutdown, wait=True)
+    return _ocr_pool
+
+def run_ocr(paths):
+    """Executa OCR das imagens (em processos separados quando há mais de uma), ordem preservada"""
+    if len(paths) > 1 and OCR_PROCESS_WORKERS > 1:
+        # Um lote intercalado por processo (uma ida e volta de IPC por worker)
+        workers = min(OCR_PROCESS_WORKERS, len(paths))
+        batches = [paths[i::workers] for i in range(workers)]
+        batch_results = list(get_ocr_pool().map(_ocr_batch, batches))
+        ocr_results = [None] * len(paths)
+        for i, results in enumerate(batch_results):
+            ocr_results[i::workers] = results
+        return ocr_results
+    
+    return get_ocr_processor().extract_text_batch(paths)
+
+def ocr_cache_key(content_digest, cache_version):
+    """Chave do cache de OCR: conteúdo da imagem + versão do backend/configuração do OCR"""
+    return hashlib.blake2b(f"{content_digest}:{cache_version}".encode('utf-8'), digest_size=32).hexdigest()
+
+def run_cached_ocr(paths):
+    """OCR com cache por conteúdo: imagens já vistas (nesta ou em outra sessão) não são reprocessadas"""
+    cache_version = get_ocr_processor().cache_version
+    digests = {path: ocr_cache_key(file_digest(path), cache_version) for path in paths}
+    cached = {
+        entry.image_hash: entry.result
+        for entry in OCRCache.query.filter(OCRCache.image_hash.in_(set(digests.values())))
+    }
+    
+    # Cada conteúdo inédito passa pelo OCR uma única vez, mesmo se repetido no upload
+    to_process = list({digests[path]: path for path in paths if digests[path] not in cached}.values())
+    fresh = {digests[path]: result for path, result in zip(to_process, run_ocr(to_process))}
+    
+    # Só resultados de um OCR real entram no cache: falhas (texto vazio) e o texto
+    # simulado do fallback seriam reaproveitados mesmo depois de instalar o Tesseract
+    new_entries = [
+        {'image_hash': digest, 'result': asdict(result)}
+        for digest, result in fresh.items() if result.from_engine and result.extracted_text
+    ]
+    if new_entries:
+        # Outra sessão pode ter gravado o mesmo hash: conflito ignorado
+        insert = pg_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+        db.session.execute(insert(OCRCache.__table__).on_conflict_do_nothing(), new_entries)
+    
+    ocr_results = []
+    for path in paths:
+        digest = digests[path]
+        result = fresh.get(digest)
+        if result is None:
+            result = ocr_result_from_dict(cached[digest], path)
+        elif result.original_image_path != path:
+            result = replace(result, original_image_path=path)
+        ocr_results.append(result)
+    
+    logging.info(f"OCR: {len(paths) - len(to_process)} imagens reaproveitadas do cache")
+    return ocr_results
+
+# Word gerado em processo separado: a serialização do python-docx é CPU-bound
+# e não deve segurar o GIL dos threads que atendem requisições
+DOCX_PROCESS_WORKERS = int(os.getenv('MVP_DOCX_PROCESSES', 2))
+_docx_pool = None
+
+def _build_docx(content, output_path, metadata):
+    """Gera o .docx no processo worker"""
+    return get_formatter().format_as_docx(content, output_path, metadata)
+
+def get_docx_pool():
+    global _docx_pool
+    if _docx_pool is None:
+        _docx_pool = ProcessPoolExecutor(max_workers=DOCX_PROCESS_WORKERS, mp_context=_POOL_CONTEXT)
+        atexit.register(_docx_pool.shutdown, wait=True)
+    return _docx_pool
 
 def get_ai_generator(provider="openai", model="gpt-4", agent_type="rpa_general", custom_api_key=None):
-    """Obter gerador AI com configuração segura"""
+    """Obter gerador AI com configuração segura (reutiliza instância se os parâmetros forem os mesmos)"""
     try:
         api_key = custom_api_key if custom_api_key else app.config.get('OPENAI_API_KEY')
         
         if not api_key or api_key == 'your-openai-api-key-here':
             raise ValueError("API Key não configurada")
         
-        return AIDocumentGenerator(
-            api_key=api_key,
-            provider=provider,
-            model=model,
-            agent_type=agent_type
-        )
+        return get_cached_generator(api_key, provider=provider, model=model, agent_type=agent_type)
     except Exception as e:
         logging.error(f"Erro ao criar AI generator: {e}")
         raise
 
+# Tamanho do bloco de cópia de uploads em memória
+UPLOAD_BUFFER_SIZE = 1 << 20
+
+def save_upload(file, file_path):
+    """Grava arquivo enviado em disco (sendfile no kernel quando possível)"""
+    stream = file.stream
+    
+    # Uploads grandes chegam em arquivo temporário: copiar direto entre descritores
+    if hasattr(os, 'sendfile'):
+        try:
+            in_fd = stream.fileno()
+        except (AttributeError, OSError, ValueError):
+            in_fd = None
+        
+        if in_fd is not None:
+            stream.flush()
+            offset = stream.tell()
+            size = os.fstat(in_fd).st_size
+            try:
+                with open(file_path, 'wb') as out:
+                    while offset < size:
+                        sent = os.sendfile(out.fileno(), in_fd, offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                return
+            except OSError:
+                # Ex.: macOS só aceita socket como destino; usar cópia em buffer
+                pass
+    
+    # Uploads pequenos ficam em memória (BytesIO): cópia sem buffer em blocos de 1 MiB
+    with open(file_path, 'wb', buffering=0) as out:
+        shutil.copyfileobj(stream, out, length=UPLOAD_BUFFER_SIZE)
+
+def serialize_ocr_result(result):
+    """Formato de session.ocr_results (mesmo do fluxo aprimorado)"""
+    return {
+        'image_path': result.original_image_path,
+        'extracted_text': result.extracted_text,
+        'confidence': result.confidence,
+        'ui_elements': [
+            {
+                'type': elem.type,
+                'text': elem.text,
+                'confidence': elem.confidence,
+                'context': elem.context
+            } for elem in result.ui_elements
+        ],
+        'processing_time': result.processing_time
+    }
+
+def existing_files(paths):
+    """Retorna o subconjunto de `paths` que existe, lendo cada diretório uma única vez"""
+    listings = {}
+    present = set()
+    
+    for path in paths:
+        directory, name = os.path.split(path)
+        if directory not in listings:
+            try:
+                with os.scandir(directory or '.') as entries:
+                    listings[directory] = {entry.name for entry in entries}
+            except OSError:
+                listings[directory] = set()
+        if name in listings[directory]:
+            present.add(path)
+    
+    return present
+
+# Extensões permitidas resolvidas uma única vez na inicialização
+ALLOWED_TRANSCRIPTION_EXTENSIONS = frozenset(ext.lower() for ext in app.config['ALLOWED_TRANSCRIPTION_EXTENSIONS'])
+ALLOWED_IMAGE_EXTENSIONS = frozenset(ext.lower() for ext in app.config['ALLOWED_IMAGE_EXTENSIONS'])
+
 def allowed_file(filename, allowed_extensions):
     """Verificar arquivo permitido"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in allowed_extensions
+    name, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in allowed_extensions
 
 @app.route('/')
 def index():
@@ -144,29 +313,32 @@ def upload_files():
         }
         
         # Criar sessão
-        session_id = str(uuid.uuid4())
+        session_id = uuid.uuid4().hex
         session = Session(
             id=session_id, 
             status='uploading', 
             transcription_only_mode=transcription_only_mode
         )
-        session.ai_config = json.dumps(ai_config)
+        session.ai_config = ai_config
         
         uploaded_files = {
             'transcription': None,
             'screenshots': []
         }
         
+        # Prefixo dos arquivos da sessão calculado uma única vez
+        base_path = os.path.join(app.config['UPLOAD_FOLDER'], session_id)
+        
         # Processar transcrição
         if 'transcription' in request.files:
             file = request.files['transcription']
-            if file and file.filename and allowed_file(file.filename, app.config['ALLOWED_TRANSCRIPTION_EXTENSIONS']):
+            if file and file.filename and allowed_file(file.filename, ALLOWED_TRANSCRIPTION_EXTENSIONS):
                 filename = secure_filename(file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_{filename}")
+                file_path = f"{base_path}_{filename}"
                 
                 # Salvar com tratamento de erro
                 try:
-                    file.save(file_path)
+                    save_upload(file, file_path)
                     uploaded_files['transcription'] = file_path
                     session.transcription_file = file_path
                 except Exception as e:
@@ -178,18 +350,19 @@ def upload_files():
         if not transcription_only_mode and 'screenshots' in request.files:
             files = request.files.getlist('screenshots')
             for i, file in enumerate(files):
-                if file and file.filename and allowed_file(file.filename, app.config['ALLOWED_IMAGE_EXTENSIONS']):
+                if file and file.filename and allowed_file(file.filename, ALLOWED_IMAGE_EXTENSIONS):
                     filename = secure_filename(file.filename)
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_{i}_{filename}")
+                    file_path = f"{base_path}_{i}_{filename}"
                     
                     try:
-                        file.save(file_path)
+                        save_upload(file, file_path)
                         screenshot_paths.append(file_path)
                         uploaded_files['screenshots'].append(file_path)
                     except Exception as e:
                         logging.error(f"Erro ao salvar screenshot {i}: {e}")
         
-        session.screenshot_files = json.dumps(screenshot_paths)
+        session.screenshot_files = screenshot_paths
+        session.files_count = (1 if uploaded_files['transcription'] else 0) + len(screenshot_paths)
         
         # Validação
         if transcription_only_mode:
@@ -228,7 +401,7 @@ def process_session(session_id):
     """Processamento SÍNCRONO para estabilidade"""
     try:
         # Buscar sessão
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
@@ -240,7 +413,7 @@ def process_session(session_id):
         db.session.commit()
         
         # Processar SINCRONAMENTE (sem threads para evitar problemas)
-        result = process_session_sync(session_id)
+        result = process_session_sync(session)
         
         if result['success']:
             return jsonify({
@@ -261,46 +434,26 @@ def process_session(session_id):
         logging.error(traceback.format_exc())
         return jsonify({'error': 'Erro interno no processamento'}), 500
 
-def process_session_sync(session_id):
-    """Processamento síncrono robusto"""
+def process_session_sync(session):
+    """Processamento síncrono robusto da sessão já carregada pela rota /process"""
     start_time = time.time()
+    session_id = session.id
+    # Documentos gerados só entram na sessão do banco no commit final
+    pending = []
+    docx_future = None
     
     try:
         logging.info(f"Iniciando processamento síncrono da sessão {session_id}")
         
-        session = Session.query.get(session_id)
-        if not session:
-            return {'success': False, 'error': 'Sessão não encontrada'}
-        
         # 1. Processar transcrição
         actions = []
         if session.transcription_file and os.path.exists(session.transcription_file):
             try:
                 parser = get_transcription_parser()
-                transcription_result = parser.process_file(session.transcription_file)
-                
-                # Importar com tratamento seguro
-                from mvp.parsers.transcription import TranscriptionSegment
-                
-                actions = parser.extract_actions([
-                    TranscriptionSegment(
-                        timestamp=seg['timestamp'],
-                        speaker=seg['speaker'],
-                        text=seg['text']
-                    ) for seg in transcription_result['segments']
-                ])
+                actions = parser.extract_actions(parser.iter_segments(session.transcription_file))
                 
-                session.processed_actions = json.dumps([
-                    {
-                        'action_type': action.action_type,
-                        'element': action.element,
-                        'sequence': action.sequence,
-                        'timestamp': action.timestamp,
-                        'speaker': action.speaker,
-                        'confidence': action.confidence,
-                        'raw_text': action.raw_text
-                    } for action in actions
-                ])
+                # Os dataclasses vão direto para a coluna JSON: o orjson os serializa em C
+                session.processed_actions = actions
                 
                 logging.info(f"Transcrição processada: {len(actions)} ações extraídas")
                 
@@ -315,37 +468,20 @@ def process_session_sync(session_id):
         ocr_results = []
         if not session.transcription_only_mode and session.screenshot_files:
             try:
-                screenshot_paths = json.loads(session.screenshot_files)
-                ocr_processor = get_ocr_processor()
+                screenshot_paths = session.screenshot_files
                 
-                for path in screenshot_paths:
-                    if os.path.exists(path):
-                        ocr_result = ocr_processor.extract_text(path)
-                        ocr_results.append(ocr_result)
+                present = existing_files(screenshot_paths)
+                existing_paths = [path for path in screenshot_paths if path in present]
                 
-                session.ocr_results = json.dumps([
-                    {
-                        'image_path': result.original_image_path,
-                        'extracted_text': result.extracted_text,
-                        'confidence': result.confidence,
-                        'ui_elements': [
-                            {
-                                'type': elem.type,
-                                'text': elem.text,
-                                'confidence': elem.confidence,
-                                'context': elem.context
-                            } for elem in result.ui_elements
-                        ],
-                        'processing_time': result.processing_time
-                    } for result in ocr_results
-                ])
+                ocr_results = run_cached_ocr(existing_paths)
+                session.ocr_results = [serialize_ocr_result(result) for result in ocr_results]
                 
                 logging.info(f"OCR processado: {len(ocr_results)} imagens")
                 
             except Exception as e:
                 logging.error(f"Erro no processamento OCR: {e}")
                 # OCR não é crítico, continuar sem ele
-                session.ocr_results = json.dumps([])
+                session.ocr_results = []
         
         # 3. Correlação
         if actions or ocr_results:
@@ -357,7 +493,7 @@ def process_session_sync(session_id):
                 logging.info(f"Correlação concluída: {correlated_process.successfully_correlated} ações")
                 
                 # 4. Gerar documentação
-                ai_config = json.loads(session.ai_config) if session.ai_config else {}
+                ai_config = session.ai_config or {}
                 
                 ai_gen = get_ai_generator(
                     provider=ai_config.get('provider', 'openai'),
@@ -369,6 +505,13 @@ def process_session_sync(session_id):
                 doc_result = ai_gen.generate_documentation(correlated_process)
                 
                 if doc_result.success:
+                    # Word gerado em outro processo enquanto o markdown é gravado;
+                    # o resultado só é aguardado antes do commit final
+                    output_path = os.path.join(app.config['OUTPUT_FOLDER'], f"{session_id}_documentation.docx")
+                    docx_future = get_docx_pool().submit(
+                        _build_docx, doc_result.content, output_path, doc_result.metadata
+                    )
+                    
                     session.generated_documentation = doc_result.content
                     
                     # Salvar documento
@@ -377,20 +520,7 @@ def process_session_sync(session_id):
                         content=doc_result.content,
                         format='markdown'
                     )
-                    db.session.add(processed_doc)
-                    
-                    # Gerar Word
-                    formatter = get_formatter()
-                    output_path = os.path.join(app.config['OUTPUT_FOLDER'], f"{session_id}_documentation.docx")
-                    
-                    if formatter.format_as_docx(doc_result.content, output_path, doc_result.metadata):
-                        processed_doc_word = ProcessedDocument(
-                            session_id=session_id,
-                            content=doc_result.content,
-                            format='docx',
-                            file_path=output_path
-                        )
-                        db.session.add(processed_doc_word)
+                    pending.append(processed_doc)
                     
                     session.status = 'completed'
                     logging.info(f"Documentação gerada com sucesso para sessão {session_id}")
@@ -399,6 +529,7 @@ def process_session_sync(session_id):
                     session.status = 'error'
                     session.error_message = doc_result.error_message
                     logging.error(f"Erro na geração IA: {doc_result.error_message}")
+                    db.session.commit()
                     return {'success': False, 'error': doc_result.error_message}
                 
             except Exception as e:
@@ -414,7 +545,26 @@ def process_session_sync(session_id):
             db.session.commit()
             return {'success': False, 'error': 'Nenhum dado válido'}
         
-        # Finalizar
+        # Finalizar: envia ao banco o markdown e a sessão enquanto o Word é gerado
+        db.session.add_all(pending)
+        db.session.flush()
+        
+        if docx_future is not None:
+            try:
+                docx_ok = docx_future.result(timeout=app.config.get('AI_TIMEOUT', 60))
+            except Exception as e:
+                # Word não é crítico: o markdown já está disponível
+                logging.error(f"Erro ao gerar documento Word: {e}")
+                docx_ok = False
+            
+            if docx_ok:
+                db.session.add(ProcessedDocument(
+                    session_id=session_id,
+                    content=session.generated_documentation,
+                    format='docx',
+                    file_path=output_path
+                ))
+        
         end_time = time.time()
         processing_time = end_time - start_time
         session.processing_time = processing_time
@@ -434,9 +584,10 @@ def process_session_sync(session_id):
         logging.error(f"Erro crítico no processamento: {e}")
         logging.error(traceback.format_exc())
         
-        # Atualizar status de erro
+        # Atualizar status de erro (objeto recarregado após descartar a transação)
         try:
-            session = Session.query.get(session_id)
+            db.session.rollback()
+            session = db.session.get(Session, session_id)
             if session:
                 session.status = 'error'
                 session.error_message = str(e)
@@ -452,7 +603,7 @@ def process_session_sync(session_id):
 def get_session_status(session_id):
     """Status da sessão"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
@@ -473,7 +624,7 @@ def get_session_status(session_id):
 def get_session_result(session_id):
     """Resultado da sessão"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
@@ -495,7 +646,7 @@ def get_session_result(session_id):
 def export_document(session_id, format):
     """Export de documento"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session or session.status != 'completed':
             return jsonify({'error': 'Sessão não encontrada ou não completada'}), 404
         
@@ -511,7 +662,11 @@ def export_document(session_id, format):
             return send_file(
                 doc.file_path,
                 as_attachment=True,
-                download_name=f"documentacao_rpa_{session_id}.docx"
+                download_name=f"documentacao_rpa_{session_id}.docx",
+                # ETag/Last-Modified do arquivo: reexport com cache válido vira 304
+                conditional=True,
+                etag=True,
+                max_age=app.config.get('SEND_FILE_MAX_AGE_DEFAULT', 3600)
             )
         elif format == 'markdown':
             return jsonify({'content': doc.content, 'format': 'markdown'})
@@ -522,13 +677,16 @@ def export_document(session_id, format):
         logging.error(f"Erro no export: {e}")
         return jsonify({'error': 'Erro interno no export'}), 500
 
+# Consulta do health check compilada uma vez; executada direto numa conexão do pool
+_HEALTH_STMT = text('SELECT 1')
+
 @app.route('/health')
 def health_check():
     """Health check"""
     try:
         # Teste básico do database
-        from sqlalchemy import text
-        db.session.execute(text('SELECT 1'))
+        with db.engine.connect() as conn:
+            conn.execute(_HEALTH_STMT)
         
         return jsonify({
             'status': 'healthy',
@@ -1,22 +1,32 @@
-from flask import Flask, request, jsonify, render_template, send_file, redirect, url_for
+from flask import Flask, request, jsonify, render_template, send_file, send_from_directory, redirect, url_for
+from flask.json.provider import JSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text, and_, or_
+from sqlalchemy.orm import defer, selectinload
 import os
+import shutil
+import hashlib
 import uuid
-import json
+import orjson
 import time
 from datetime import datetime
+from dataclasses import replace
 from werkzeug.utils import secure_filename
-from threading import Thread
-import traceback
+from werkzeug.exceptions import NotFound
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import atexit
+from functools import lru_cache
+from operator import attrgetter
 
 # Importações dos módulos MVP
 from config import config
-from mvp.models import db, Session, ProcessedDocument, ProcessingLog
-from mvp.utils.logging_helper import SessionLogger
+from mvp.models import db, json_dumps, register_sqlite_pragmas, upgrade_json_columns, Session, ProcessedDocument, ProcessedAction, ProcessingLog
+from mvp.utils.logging_helper import SessionLogger, flush_logs, start_log_writer
+from mvp.utils.hashing import file_digest
 from mvp.parsers.transcription import BasicTranscriptionParser
-from mvp.processors.ocr import BasicOCR
+from mvp.processors.ocr import BasicOCR, TESSERACT_AVAILABLE
 from mvp.processors.correlator import BasicCorrelator
-from mvp.generators.ai_client import AIDocumentGenerator
+from mvp.generators.ai_client import get_cached_generator
 from mvp.generators.formatter import DocumentFormatter
 
 # Importações MVP_02 - Enhanced features
@@ -24,10 +34,36 @@ from mvp.processors.enhanced_ocr import EnhancedOCRProcessor
 from mvp.processors.temporal_correlator import AdvancedTemporalCorrelator
 from mvp.generators.domain_templates import DomainTemplateManager, ProcessDomain
 from mvp.validators.document_validator import DocumentValidator
+from mvp.utils.prompt_loader import PromptLoader
+
+# Fila externa (opcional): com REDIS_URL definido o processamento roda em workers RQ
+try:
+    import redis
+    from rq import Queue
+    RQ_AVAILABLE = True
+except ImportError:
+    RQ_AVAILABLE = False
+
+class ORJSONProvider(JSONProvider):
+    """Provider JSON do Flask baseado em orjson: jsonify() serializa em C"""
+    
+    def dumps(self, obj, **kwargs):
+        return json_dumps(obj)
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+            mimetype='application/json'
+        )
 
 def create_app(config_name=None):
     """Factory function para criar aplicação Flask"""
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
     
     # Configuração
     config_name = config_name or os.getenv('FLASK_ENV', 'development')
@@ -39,7 +75,12 @@ def create_app(config_name=None):
     
     # Criar tabelas
     with app.app_context():
+        register_sqlite_pragmas()
         db.create_all()
+        upgrade_json_columns()
+    
+    # Logs de processamento gravados em lote por uma thread dedicada
+    start_log_writer(app)
     
     return app
 
@@ -57,34 +98,217 @@ enhanced_ocr_processor = EnhancedOCRProcessor()
 advanced_correlator = AdvancedTemporalCorrelator()
 domain_manager = DomainTemplateManager()
 document_validator = DocumentValidator()
+prompt_loader = PromptLoader()
+
+# Número máximo de workers para OCR paralelo
+OCR_MAX_WORKERS = min(8, os.cpu_count() or 1)
 
-# Inicializar cliente AI (será feito sob demanda para verificar API key)
-ai_generator = None
+# Pool compartilhado para o processamento de sessões em segundo plano
+EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv('MVP_WORKERS', '4')),
+    thread_name_prefix='mvp-proc'
+)
+atexit.register(EXECUTOR.shutdown, wait=True)
+
+# Pool dedicado ao fluxo aprimorado (OCR + IA + validação + docx), para que
+# sessões longas não ocupem os workers do fluxo básico
+ENHANCED_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv('MVP_ENHANCED_WORKERS', '2')),
+    thread_name_prefix='mvp-enhanced'
+)
+atexit.register(ENHANCED_EXECUTOR.shutdown, wait=True)
+
+# Tempo máximo de um job de processamento na fila RQ (segundos)
+RQ_JOB_TIMEOUT = 1800
+
+processing_queue = None
+enhanced_queue = None
+if RQ_AVAILABLE and os.getenv('REDIS_URL'):
+    _redis = redis.Redis.from_url(os.getenv('REDIS_URL'))
+    processing_queue = Queue('mvp', connection=_redis)
+    # Workers dedicados: ``rq worker mvp-enhanced`` (ou ``rq worker mvp mvp-enhanced``)
+    enhanced_queue = Queue('mvp-enhanced', connection=_redis)
+
+def enqueue_processing(func, session_id, enhanced=False):
+    """Envia processamento para a fila RQ (``rq worker mvp``) ou para o pool local"""
+    queue = enhanced_queue if enhanced else processing_queue
+    if queue is not None:
+        queue.enqueue(func, session_id, job_timeout=RQ_JOB_TIMEOUT)
+    else:
+        (ENHANCED_EXECUTOR if enhanced else EXECUTOR).submit(func, session_id)
 
 def get_ai_generator(provider="openai", model="gpt-4", agent_type="rpa_general", custom_api_key=None):
-    """Obtém gerador AI (lazy initialization)"""
-    global ai_generator
-    
+    """Obtém gerador AI (reutiliza instância se os parâmetros forem os mesmos)"""
     # Usar API key customizada se fornecida, senão usar a padrão
     api_key = custom_api_key if custom_api_key else app.config.get('OPENAI_API_KEY')
     
     if not api_key or api_key == 'your-openai-api-key-here':
         raise ValueError("API Key não configurada. Por favor, configure sua chave ou forneça uma chave personalizada.")
     
-    # Sempre criar nova instância se parâmetros mudaram
-    ai_generator = AIDocumentGenerator(
-        api_key=api_key,
-        provider=provider,
-        model=model,
-        agent_type=agent_type
+    return get_cached_generator(api_key, provider=provider, model=model, agent_type=agent_type)
+
+def _parse_ai_config(ai_config):
+    """Converte ai_config da sessão em (provider, model, agent_type, custom_api_key)"""
+    ai_config = ai_config or {}
+    return (
+        ai_config.get('provider', 'openai'),
+        ai_config.get('model', 'gpt-4'),
+        ai_config.get('agent_type', 'rpa_general'),
+        ai_config.get('custom_api_key')
+    )
+
+def save_processed_actions(session_id, actions):
+    """Grava as ações extraídas como linhas de ProcessedAction em um único INSERT em lote"""
+    ProcessedAction.query.filter_by(session_id=session_id).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(ProcessedAction, [
+        {
+            'session_id': session_id,
+            'sequence': action.sequence,
+            'action_type': action.action_type,
+            'element': action.element,
+            'timestamp': action.timestamp,
+            'speaker': action.speaker,
+            'confidence': action.confidence,
+            'raw_text': action.raw_text
+        } for action in actions
+    ])
+
+# Tipos MIME dos arquivos servidos para download, por extensão
+DOWNLOAD_MIMETYPES = {
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'md': 'text/markdown',
+    'txt': 'text/plain',
+    'vtt': 'text/vtt',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'bmp': 'image/bmp'
+}
+
+def send_artifact(folder, file_path, download_name):
+    """Envia um arquivo de UPLOAD_FOLDER/OUTPUT_FOLDER como anexo (NotFound se não existir)"""
+    extension = os.path.splitext(file_path)[1].lower().lstrip('.')
+    return send_from_directory(
+        folder,
+        os.path.basename(file_path),
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=DOWNLOAD_MIMETYPES.get(extension, 'application/octet-stream')
     )
+
+# Prefixo dos artefatos gerados por sessão ("<OUTPUT_FOLDER>/"), resolvido uma vez
+OUTPUT_DIR = app.config['OUTPUT_FOLDER']
+OUTPUT_PREFIX = OUTPUT_DIR.rstrip(os.sep) + os.sep
+
+def session_output_path(session_id, suffix):
+    """Caminho de um artefato da sessão em OUTPUT_FOLDER (ex.: suffix='validation_report.json')"""
+    return f"{OUTPUT_PREFIX}{session_id}_{suffix}"
+
+def documentation_path(session_id):
+    """Caminho do markdown da documentação de uma sessão em OUTPUT_FOLDER"""
+    return session_output_path(session_id, "documentation.md")
+
+def write_documentation_file(session_id, content):
+    """Grava o markdown da documentação uma vez, para os downloads servirem direto do disco"""
+    path = documentation_path(session_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.write(content)
+    return path
+
+def file_stat(path):
+    """Retorna (existe, tamanho) de um arquivo com uma única chamada a os.stat"""
+    if not path:
+        return False, 0
+    try:
+        return True, os.stat(path).st_size
+    except OSError:
+        return False, 0
+
+def existing_files(paths):
+    """Retorna o subconjunto de `paths` que existe, lendo cada diretório uma única vez"""
+    listings = {}
+    present = set()
+    
+    for path in paths:
+        directory, name = os.path.split(path)
+        if directory not in listings:
+            try:
+                with os.scandir(directory or '.') as entries:
+                    listings[directory] = {entry.name for entry in entries}
+            except OSError:
+                listings[directory] = set()
+        if name in listings[directory]:
+            present.add(path)
     
-    return ai_generator
+    return present
+
+def serialize_ocr_result(result):
+    """Formato de session.ocr_results compartilhado pelos fluxos básico e aprimorado"""
+    return {
+        'image_path': result.original_image_path,
+        'extracted_text': result.extracted_text,
+        'confidence': result.confidence,
+        'ui_elements': [
+            {
+                'type': elem.type,
+                'text': elem.text,
+                'confidence': elem.confidence,
+                'context': elem.context
+            } for elem in result.ui_elements
+        ],
+        'processing_time': result.processing_time
+    }
+
+# Buffer de 64 KiB para gravação de uploads (o padrão do Werkzeug é 16 KiB)
+UPLOAD_BUFFER_SIZE = 1 << 16
+
+def save_upload(file, file_path):
+    """Grava arquivo enviado em disco (sendfile no kernel quando possível)"""
+    stream = file.stream
+    
+    # Uploads grandes chegam em arquivo temporário: copiar direto entre descritores
+    if hasattr(os, 'sendfile'):
+        try:
+            in_fd = stream.fileno()
+        except (AttributeError, OSError, ValueError):
+            in_fd = None
+        
+        if in_fd is not None:
+            stream.flush()
+            offset = stream.tell()
+            size = os.fstat(in_fd).st_size
+            try:
+                with open(file_path, 'wb') as out:
+                    while offset < size:
+                        sent = os.sendfile(out.fileno(), in_fd, offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                return
+            except OSError:
+                # Ex.: macOS só aceita socket como destino; usar cópia em buffer
+                pass
+    
+    # Uploads pequenos ficam em memória (BytesIO): cópia em blocos de 64 KiB
+    with open(file_path, 'wb', buffering=UPLOAD_BUFFER_SIZE) as out:
+        shutil.copyfileobj(stream, out, length=UPLOAD_BUFFER_SIZE)
+
+# Extensões permitidas resolvidas uma única vez na inicialização
+ALLOWED_TRANSCRIPTION_EXTENSIONS = frozenset(ext.lower() for ext in app.config['ALLOWED_TRANSCRIPTION_EXTENSIONS'])
+ALLOWED_IMAGE_EXTENSIONS = frozenset(ext.lower() for ext in app.config['ALLOWED_IMAGE_EXTENSIONS'])
+
+# Campos de cada evento correlacionado usados nos passos detalhados do template
+_step_fields = attrgetter('action.action_type', 'action.element', 'action.raw_text')
+
+# Status de sessão que indicam processamento concluído (básico ou aprimorado)
+COMPLETED_STATUSES = frozenset(('completed', 'completed_enhanced'))
 
 def allowed_file(filename, allowed_extensions):
     """Verifica se arquivo tem extensão permitida"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in allowed_extensions
+    name, dot, ext = filename.rpartition('.')
+    return bool(dot) and ext.lower() in allowed_extensions
 
 @app.route('/')
 def index():
@@ -116,7 +340,7 @@ def upload_files():
         session = Session(id=session_id, status='uploading', transcription_only_mode=transcription_only_mode)
         
         # Salvar configurações de IA na sessão (como JSON)
-        session.ai_config = json.dumps(ai_config)
+        session.ai_config = ai_config
         
         uploaded_files = {
             'transcription': None,
@@ -126,26 +350,33 @@ def upload_files():
         # Processar arquivo de transcrição
         if 'transcription' in request.files:
             file = request.files['transcription']
-            if file and file.filename and allowed_file(file.filename, app.config['ALLOWED_TRANSCRIPTION_EXTENSIONS']):
+            if file and file.filename and allowed_file(file.filename, ALLOWED_TRANSCRIPTION_EXTENSIONS):
                 filename = secure_filename(file.filename)
                 file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_{filename}")
-                file.save(file_path)
+                save_upload(file, file_path)
                 uploaded_files['transcription'] = file_path
                 session.transcription_file = file_path
         
         # Processar screenshots (apenas se não for modo apenas transcrição)
         screenshot_paths = []
+        failed_screenshots = []
         if not transcription_only_mode and 'screenshots' in request.files:
             files = request.files.getlist('screenshots')
             for i, file in enumerate(files):
-                if file and file.filename and allowed_file(file.filename, app.config['ALLOWED_IMAGE_EXTENSIONS']):
+                if file and file.filename and allowed_file(file.filename, ALLOWED_IMAGE_EXTENSIONS):
                     filename = secure_filename(file.filename)
                     file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_{i}_{filename}")
-                    file.save(file_path)
+                    try:
+                        save_upload(file, file_path)
+                    except OSError as e:
+                        app.logger.error(f"Erro ao salvar screenshot {filename}: {str(e)}")
+                        failed_screenshots.append(filename)
+                        continue
                     screenshot_paths.append(file_path)
                     uploaded_files['screenshots'].append(file_path)
         
-        session.screenshot_files = json.dumps(screenshot_paths)
+        session.screenshot_files = screenshot_paths
+        session.files_count = (1 if uploaded_files['transcription'] else 0) + len(screenshot_paths)
         
         # Validação baseada no modo
         if transcription_only_mode:
@@ -168,7 +399,8 @@ def upload_files():
             'files_received': {
                 'transcription': bool(uploaded_files['transcription']),
                 'screenshots': len(uploaded_files['screenshots'])
-            }
+            },
+            'files_failed': failed_screenshots
         })
         
     except Exception as e:
@@ -180,7 +412,7 @@ def process_session(session_id):
     """Inicia processamento básico de uma sessão"""
     try:
         # Buscar sessão
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
@@ -191,10 +423,8 @@ def process_session(session_id):
         session.status = 'processing'
         db.session.commit()
         
-        # Iniciar processamento em thread separada
-        thread = Thread(target=process_session_async, args=(session_id,))
-        thread.daemon = True
-        thread.start()
+        # Enfileirar processamento (fila RQ ou pool de workers)
+        enqueue_processing(process_session_async, session_id)
         
         return jsonify({
             'session_id': session_id,
@@ -211,7 +441,7 @@ def process_session_enhanced(session_id):
     """Inicia processamento aprimorado (MVP_02) de uma sessão"""
     try:
         # Buscar sessão
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
@@ -222,10 +452,8 @@ def process_session_enhanced(session_id):
         session.status = 'processing_enhanced'
         db.session.commit()
         
-        # Iniciar processamento aprimorado em thread separada
-        thread = Thread(target=process_session_enhanced_async, args=(session_id,))
-        thread.daemon = True
-        thread.start()
+        # Enfileirar processamento aprimorado (fila RQ ou pool de workers)
+        enqueue_processing(process_session_enhanced_async, session_id, enhanced=True)
         
         return jsonify({
             'session_id': session_id,
@@ -242,17 +470,21 @@ def process_session_async(session_id):
     with app.app_context():
         start_time = time.time()
         session_logger = SessionLogger(session_id)
+        session = None
         
         try:
             session_logger.step_start('processing', f'Processamento da sessão {session_id}')
             app.logger.info(f"🚀 Iniciando processamento da sessão {session_id}")
             
-            session = Session.query.get(session_id)
+            session = db.session.get(Session, session_id)
             if not session:
                 session_logger.error('processing', 'Sessão não encontrada', {'session_id': session_id})
                 app.logger.error(f"❌ Sessão {session_id} não encontrada")
                 return
             
+            # Novos registros são acumulados e gravados em um único commit no final
+            pending = []
+            
             # 1. Processar transcrição
             session_logger.step_start('transcription', 'Processamento de transcrição')
             app.logger.info(f"📝 Processando transcrição para sessão {session_id}")
@@ -263,26 +495,19 @@ def process_session_async(session_id):
                 app.logger.info(f"📄 Arquivo de transcrição encontrado: {session.transcription_file}")
                 
                 try:
-                    transcription_result = transcription_parser.process_file(session.transcription_file)
-                    segments_count = len(transcription_result.get('segments', []))
+                    # Parsing e extração de ações em uma única passada sobre os segmentos
+                    transcription_stats = {}
+                    actions = transcription_parser.extract_actions(
+                        transcription_parser.iter_segments(session.transcription_file, transcription_stats)
+                    )
+                    segments_count = transcription_stats.get('total_segments', 0)
                     session_logger.step_progress('transcription', f'Arquivo processado: {segments_count} segmentos')
                     app.logger.info(f"✅ Transcrição processada: {segments_count} segmentos")
                     
-                    # Importar TranscriptionSegment corretamente
-                    from mvp.parsers.transcription import TranscriptionSegment
-                    
-                    actions = transcription_parser.extract_actions([
-                        TranscriptionSegment(
-                            timestamp=seg['timestamp'],
-                            speaker=seg['speaker'],
-                            text=seg['text']
-                        ) for seg in transcription_result['segments']
-                    ])
-                    
                     session_logger.step_complete('transcription', 'Transcrição processada com sucesso', {
                         'segments_count': segments_count,
                         'actions_count': len(actions),
-                        'speakers': transcription_result.get('summary', {}).get('speakers', [])
+                        'speakers': sorted(transcription_stats.get('speakers', ()))
                     })
                     
                 except Exception as transcription_error:
@@ -290,17 +515,7 @@ def process_session_async(session_id):
                     raise transcription_error
                 
                 # Salvar resultado da transcrição
-                session.processed_actions = json.dumps([
-                    {
-                        'action_type': action.action_type,
-                        'element': action.element,
-                        'sequence': action.sequence,
-                        'timestamp': action.timestamp,
-                        'speaker': action.speaker,
-                        'confidence': action.confidence,
-                        'raw_text': action.raw_text
-                    } for action in actions
-                ])
+                save_processed_actions(session_id, actions)
             
             # 2. Processar screenshots (apenas se não for modo apenas transcrição)
             session_logger.step_start('ocr', 'Processamento de OCR')
@@ -315,37 +530,66 @@ def process_session_async(session_id):
                 app.logger.info(f"🖼️ Processando screenshots para sessão {session_id}")
                 
                 if session.screenshot_files:
-                    screenshot_paths = json.loads(session.screenshot_files)
+                    screenshot_paths = session.screenshot_files
                     session_logger.step_progress('ocr', f'{len(screenshot_paths)} screenshots encontrados')
                     app.logger.info(f"📸 {len(screenshot_paths)} screenshots encontrados")
                     
                     successful_ocr = 0
                     failed_ocr = 0
                     
-                    for i, path in enumerate(screenshot_paths):
-                        if os.path.exists(path):
-                            session_logger.step_progress('ocr', f'Processando screenshot {i+1}/{len(screenshot_paths)}')
-                            app.logger.info(f"🔍 Processando screenshot {i+1}/{len(screenshot_paths)}: {os.path.basename(path)}")
-                            
-                            try:
-                                ocr_result = ocr_processor.extract_text(path)
-                                ocr_results.append(ocr_result)
-                                successful_ocr += 1
-                                session_logger.step_progress('ocr', f'OCR concluído para {os.path.basename(path)}: {len(ocr_result.extracted_text)} caracteres')
-                                app.logger.info(f"✅ OCR concluído para {os.path.basename(path)}: {len(ocr_result.extracted_text)} caracteres extraídos")
-                            except Exception as ocr_error:
-                                failed_ocr += 1
-                                session_logger.warning('ocr', f'Erro no OCR para {os.path.basename(path)}', {'error': str(ocr_error)})
-                                app.logger.error(f"❌ Erro no OCR para {path}: {ocr_error}")
+                    present = existing_files(screenshot_paths)
+                    existing_paths = []
+                    for path in screenshot_paths:
+                        if path in present:
+                            existing_paths.append(path)
                         else:
                             failed_ocr += 1
                             session_logger.warning('ocr', f'Arquivo não encontrado: {os.path.basename(path)}')
                             app.logger.warning(f"⚠️ Arquivo não encontrado: {path}")
                     
+                    # Screenshots idênticos (mesmo hash de conteúdo) passam pelo OCR uma única vez
+                    digests = [file_digest(path) for path in existing_paths]
+                    first_index_by_digest = {}
+                    for i, digest in enumerate(digests):
+                        first_index_by_digest.setdefault(digest, i)
+                    unique_indexes = sorted(first_index_by_digest.values())
+                    
+                    # OCR em paralelo (Tesseract libera o GIL); logs ficam na thread principal
+                    ocr_by_index = {}
+                    if unique_indexes:
+                        with ThreadPoolExecutor(max_workers=min(OCR_MAX_WORKERS, len(unique_indexes))) as executor:
+                            futures = {
+                                executor.submit(ocr_processor.extract_text, existing_paths[i]): (i, existing_paths[i])
+                                for i in unique_indexes
+                            }
+                            for future in as_completed(futures):
+                                i, path = futures[future]
+                                try:
+                                    ocr_result = future.result()
+                                    ocr_by_index[i] = ocr_result
+                                    successful_ocr += 1
+                                    session_logger.step_progress('ocr', f'OCR concluído para {os.path.basename(path)}: {len(ocr_result.extracted_text)} caracteres')
+                                    app.logger.info(f"✅ OCR concluído para {os.path.basename(path)}: {len(ocr_result.extracted_text)} caracteres extraídos")
+                                except Exception as ocr_error:
+                                    failed_ocr += 1
+                                    session_logger.warning('ocr', f'Erro no OCR para {os.path.basename(path)}', {'error': str(ocr_error)})
+                                    app.logger.error(f"❌ Erro no OCR para {path}: {ocr_error}")
+                    
+                    # Reaproveitar o resultado do primeiro screenshot idêntico
+                    duplicate_screenshots = len(existing_paths) - len(unique_indexes)
+                    for i, digest in enumerate(digests):
+                        first_index = first_index_by_digest[digest]
+                        if first_index != i and first_index in ocr_by_index:
+                            ocr_by_index[i] = replace(ocr_by_index[first_index], original_image_path=existing_paths[i])
+                    
+                    # Manter a ordem original dos screenshots
+                    ocr_results = [ocr_by_index[i] for i in sorted(ocr_by_index)]
+                    
                     session_logger.step_complete('ocr', 'Processamento de screenshots concluído', {
                         'total_screenshots': len(screenshot_paths),
                         'successful_ocr': successful_ocr,
                         'failed_ocr': failed_ocr,
+                        'duplicate_screenshots': duplicate_screenshots,
                         'total_results': len(ocr_results)
                     })
                     app.logger.info(f"✅ Processamento de screenshots concluído: {len(ocr_results)} resultados")
@@ -354,22 +598,7 @@ def process_session_async(session_id):
                     app.logger.info(f"📸 Nenhum screenshot encontrado")
             
             # Salvar resultados OCR (mesmo que vazio no modo apenas transcrição)
-            session.ocr_results = json.dumps([
-                {
-                    'image_path': result.original_image_path,
-                    'extracted_text': result.extracted_text,
-                    'confidence': result.confidence,
-                    'ui_elements': [
-                        {
-                            'type': elem.type,
-                            'text': elem.text,
-                            'confidence': elem.confidence,
-                            'context': elem.context
-                        } for elem in result.ui_elements
-                    ],
-                    'processing_time': result.processing_time
-                } for result in ocr_results
-            ])
+            session.ocr_results = [serialize_ocr_result(result) for result in ocr_results]
             
             # 3. Correlacionar dados
             session_logger.step_start('correlation', 'Correlação áudio-visual')
@@ -400,16 +629,16 @@ def process_session_async(session_id):
                 
                 try:
                     # Carregar configurações de IA da sessão
-                    ai_config = json.loads(session.ai_config) if session.ai_config else {}
+                    provider, model, agent_type, custom_api_key = _parse_ai_config(session.ai_config)
                     
                     ai_gen = get_ai_generator(
-                        provider=ai_config.get('provider', 'openai'),
-                        model=ai_config.get('model', 'gpt-4'),
-                        agent_type=ai_config.get('agent_type', 'rpa_general'),
-                        custom_api_key=ai_config.get('custom_api_key')
+                        provider=provider,
+                        model=model,
+                        agent_type=agent_type,
+                        custom_api_key=custom_api_key
                     )
-                    session_logger.step_progress('ai', f'Cliente IA inicializado - Provedor: {ai_config.get("provider", "openai")}, Agente: {ai_config.get("agent_type", "rpa_general")}')
-                    app.logger.info(f"✅ Cliente IA inicializado com {ai_config.get('provider', 'openai')} usando agente {ai_config.get('agent_type', 'rpa_general')}")
+                    session_logger.step_progress('ai', f'Cliente IA inicializado - Provedor: {provider}, Agente: {agent_type}')
+                    app.logger.info(f"✅ Cliente IA inicializado com {provider} usando agente {agent_type}")
                     
                     session_logger.step_progress('ai', 'Gerando documentação...')
                     doc_result = ai_gen.generate_documentation(correlated_process)
@@ -431,6 +660,7 @@ def process_session_async(session_id):
                 if doc_result.success:
                     # Salvar documentação gerada
                     session.generated_documentation = doc_result.content
+                    write_documentation_file(session_id, doc_result.content)
                     
                     # Criar documento processado
                     processed_doc = ProcessedDocument(
@@ -438,13 +668,13 @@ def process_session_async(session_id):
                         content=doc_result.content,
                         format='markdown'
                     )
-                    db.session.add(processed_doc)
+                    pending.append(processed_doc)
                     
                     # 5. Exportar documentos
                     session_logger.step_start('export', 'Exportação de documentos')
                     
                     # Gerar arquivo Word
-                    output_path = os.path.join(app.config['OUTPUT_FOLDER'], f"{session_id}_documentation.docx")
+                    output_path = session_output_path(session_id, "documentation.docx")
                     if formatter.format_as_docx(doc_result.content, output_path, doc_result.metadata):
                         processed_doc_word = ProcessedDocument(
                             session_id=session_id,
@@ -452,7 +682,7 @@ def process_session_async(session_id):
                             format='docx',
                             file_path=output_path
                         )
-                        db.session.add(processed_doc_word)
+                        pending.append(processed_doc_word)
                         session_logger.step_complete('export', 'Documento Word gerado', {'file_path': output_path})
                         app.logger.info(f"📄 Documento Word gerado: {output_path}")
                     else:
@@ -467,7 +697,6 @@ def process_session_async(session_id):
                     # Atualizar sessão com estatísticas
                     session.processing_time = processing_time
                     session.actions_count = len(actions)
-                    session.files_count = (1 if session.transcription_file else 0) + len(ocr_results)
                     
                     session_logger.step_complete('processing', 'Processamento concluído com sucesso', {
                         'processing_time': f"{processing_time:.2f}s",
@@ -490,12 +719,13 @@ def process_session_async(session_id):
                 app.logger.error("Nenhum dado válido para processar")
             
             session.updated_at = datetime.utcnow()
+            db.session.add_all(pending)
             db.session.commit()
             
         except Exception as e:
-            # Marcar sessão como erro
-            session = Session.query.get(session_id)
-            if session:
+            # Descartar inserções pendentes e marcar sessão como erro (reaproveita a instância já carregada)
+            db.session.rollback()
+            if session is not None:
                 end_time = time.time()
                 processing_time = end_time - start_time
                 
@@ -506,86 +736,66 @@ def process_session_async(session_id):
                 db.session.commit()
                 
                 session_logger.step_error('processing', f'Erro crítico no processamento', e)
-                app.logger.error(f"❌ Erro crítico no processamento da sessão {session_id}: {str(e)}")
-                app.logger.error(traceback.format_exc())
+                app.logger.exception(f"❌ Erro crítico no processamento da sessão {session_id}: {str(e)}")
+        
+        finally:
+            # Logs visíveis ao fim do job (work-horses do RQ saem via os._exit, sem atexit)
+            flush_logs(app)
 
 def process_session_enhanced_async(session_id):
     """Processa sessão com funcionalidades aprimoradas (MVP_02)"""
     with app.app_context():
+        session = None
+        pending = []
         try:
-            session = Session.query.get(session_id)
+            session = db.session.get(Session, session_id)
             if not session:
                 return
             
             # 1. Processar transcrição (igual ao básico)
             actions = []
             if session.transcription_file and os.path.exists(session.transcription_file):
-                transcription_result = transcription_parser.process_file(session.transcription_file)
-                # Importar TranscriptionSegment corretamente
-                from mvp.parsers.transcription import TranscriptionSegment
-                
-                actions = transcription_parser.extract_actions([
-                    TranscriptionSegment(
-                        timestamp=seg['timestamp'],
-                        speaker=seg['speaker'],
-                        text=seg['text']
-                    ) for seg in transcription_result['segments']
-                ])
+                actions = transcription_parser.extract_actions(
+                    transcription_parser.iter_segments(session.transcription_file)
+                )
                 
                 # Salvar resultado da transcrição
-                session.processed_actions = json.dumps([
-                    {
-                        'action_type': action.action_type,
-                        'element': action.element,
-                        'sequence': action.sequence,
-                        'timestamp': action.timestamp,
-                        'speaker': action.speaker,
-                        'confidence': action.confidence,
-                        'raw_text': action.raw_text
-                    } for action in actions
-                ])
+                save_processed_actions(session_id, actions)
             
             # 2. Processar screenshots com OCR aprimorado
             ocr_results = []
             enhanced_ocr_results = []
             if session.screenshot_files:
-                screenshot_paths = json.loads(session.screenshot_files)
-                for path in screenshot_paths:
-                    if os.path.exists(path):
-                        # Usar OCR aprimorado para melhor precisão
-                        enhanced_result = enhanced_ocr_processor.process_image_enhanced(path)
-                        enhanced_ocr_results.append(enhanced_result)
-                        
-                        # Converter para formato compatível com correlator básico
-                        basic_result = ocr_processor.OCRResult(
-                            original_image_path=enhanced_result.original_image_path,
-                            extracted_text=enhanced_result.extracted_text,
-                            confidence=enhanced_result.confidence,
-                            ui_elements=enhanced_result.ui_elements,
-                            processing_time=enhanced_result.processing_time,
-                            preprocessing_applied=enhanced_result.preprocessing_applied
-                        )
-                        ocr_results.append(basic_result)
+                screenshot_paths = session.screenshot_files
+                present = existing_files(screenshot_paths)
+                existing_paths = [path for path in screenshot_paths if path in present]
+                
+                # Usar OCR aprimorado para melhor precisão (em paralelo, ordem preservada)
+                if existing_paths:
+                    with ThreadPoolExecutor(max_workers=min(OCR_MAX_WORKERS, len(existing_paths))) as executor:
+                        enhanced_ocr_results = list(executor.map(enhanced_ocr_processor.process_image_enhanced, existing_paths))
+                
+                for enhanced_result in enhanced_ocr_results:
+                    # Converter para formato compatível com correlator básico
+                    basic_result = ocr_processor.OCRResult(
+                        original_image_path=enhanced_result.original_image_path,
+                        extracted_text=enhanced_result.extracted_text,
+                        confidence=enhanced_result.confidence,
+                        ui_elements=enhanced_result.ui_elements,
+                        processing_time=enhanced_result.processing_time,
+                        preprocessing_applied=enhanced_result.preprocessing_applied
+                    )
+                    ocr_results.append(basic_result)
                 
                 # Salvar resultados OCR aprimorados
-                session.ocr_results = json.dumps([
+                # Mesmo formato do fluxo básico, acrescido das métricas do OCR aprimorado
+                session.ocr_results = [
                     {
-                        'image_path': result.original_image_path,
-                        'extracted_text': result.extracted_text,
-                        'confidence': result.confidence,
+                        **serialize_ocr_result(result),
                         'engine_used': result.engine_used,
-                        'ui_elements': [
-                            {
-                                'type': elem.type,
-                                'text': elem.text,
-                                'confidence': elem.confidence,
-                                'context': elem.context
-                            } for elem in result.ui_elements
-                        ],
-                        'processing_time': result.processing_time,
                         'quality_metrics': result.quality_metrics
                     } for result in enhanced_ocr_results
-                ])
+                ]
             
             # 3. Correlação avançada com análise temporal
             if actions or ocr_results:
@@ -607,26 +817,24 @@ def process_session_enhanced_async(session_id):
                 
                 # 5. Gerar documentação com template específico do domínio
                 # Carregar configurações de IA da sessão
-                ai_config = json.loads(session.ai_config) if session.ai_config else {}
+                provider, model, agent_type, custom_api_key = _parse_ai_config(session.ai_config)
                 
                 ai_gen = get_ai_generator(
-                    provider=ai_config.get('provider', 'openai'),
-                    model=ai_config.get('model', 'gpt-4'),
-                    agent_type=ai_config.get('agent_type', 'rpa_general'),
-                    custom_api_key=ai_config.get('custom_api_key')
+                    provider=provider,
+                    model=model,
+                    agent_type=agent_type,
+                    custom_api_key=custom_api_key
                 )
                 
                 # Obter template específico do domínio
                 context_data = {
                     'system_name': 'Sistema identificado',
                     'process_name': f'Processo {domain.value}',
-                    'detailed_steps': [
-                        {
-                            'action': event.action.action_type,
-                            'element': event.action.element,
-                            'description': event.action.raw_text
-                        } for event in correlated_process.correlated_events
-                    ]
+                    # Gerador: consumido uma única vez ao renderizar o template
+                    'detailed_steps': (
+                        {'action': action_type, 'element': element, 'description': raw_text}
+                        for action_type, element, raw_text in map(_step_fields, correlated_process.correlated_events)
+                    )
                 }
                 
                 # Gerar documentação usando template do domínio
@@ -659,12 +867,10 @@ def process_session_enhanced_async(session_id):
                     
                     # Salvar documentação com validações
                     session.generated_documentation = final_documentation
+                    write_documentation_file(session_id, final_documentation)
                     
                     # Salvar relatório de validação
-                    validation_path = os.path.join(
-                        app.config['OUTPUT_FOLDER'], 
-                        f"{session_id}_validation_report.json"
-                    )
+                    validation_path = session_output_path(session_id, "validation_report.json")
                     document_validator.export_validation_report(validation_report, validation_path)
                     
                     # Criar documento processado
@@ -673,13 +879,10 @@ def process_session_enhanced_async(session_id):
                         content=final_documentation,
                         format='markdown'
                     )
-                    db.session.add(processed_doc)
+                    pending.append(processed_doc)
                     
                     # Gerar arquivo Word
-                    output_path = os.path.join(
-                        app.config['OUTPUT_FOLDER'], 
-                        f"{session_id}_documentation_enhanced.docx"
-                    )
+                    output_path = session_output_path(session_id, "documentation_enhanced.docx")
                     enhanced_metadata = {
                         **doc_result.metadata,
                         'domain': domain.value,
@@ -694,7 +897,7 @@ def process_session_enhanced_async(session_id):
                             format='docx',
                             file_path=output_path
                         )
-                        db.session.add(processed_doc_word)
+                        pending.append(processed_doc_word)
                     
                     session.status = 'completed_enhanced'
                 else:
@@ -705,25 +908,49 @@ def process_session_enhanced_async(session_id):
                 session.status = 'error'
                 app.logger.error("Nenhum dado válido para processar (enhanced)")
             
+            # Documentos gravados junto com o status em um único commit
             session.updated_at = datetime.utcnow()
+            db.session.add_all(pending)
             db.session.commit()
             
         except Exception as e:
-            # Marcar sessão como erro
-            session.status = 'error'
-            session.updated_at = datetime.utcnow()
-            db.session.commit()
-            app.logger.error(f"Erro no processamento assíncrono aprimorado: {str(e)}")
-            app.logger.error(traceback.format_exc())
+            # Descartar inserções pendentes e marcar sessão como erro
+            db.session.rollback()
+            if session is not None:
+                session.status = 'error'
+                session.updated_at = datetime.utcnow()
+                db.session.commit()
+            app.logger.exception(f"Erro no processamento assíncrono aprimorado: {str(e)}")
+        
+        finally:
+            flush_logs(app)
 
 @app.route('/status/<session_id>')
 def get_session_status(session_id):
     """Obtém status de uma sessão"""
     try:
-        session = Session.query.get(session_id)
-        if not session:
+        # Polling: consulta só status/updated_at e responde 304 se nada mudou
+        row = db.session.query(Session.status, Session.updated_at).filter_by(id=session_id).first()
+        if not row:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
+        last_modified = row.updated_at.replace(microsecond=0)
+        etag = hashlib.blake2b(f"{row.status}:{row.updated_at.isoformat()}".encode(), digest_size=8).hexdigest()
+        
+        if request.if_none_match:
+            not_modified = etag in request.if_none_match
+        else:
+            not_modified = request.if_modified_since is not None and \
+                last_modified <= request.if_modified_since.replace(tzinfo=None)
+        
+        if not_modified:
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return response
+        
+        session = db.session.get(Session, session_id)
+        
         response = {
             'session_id': session_id,
             'status': session.status,
@@ -732,21 +959,21 @@ def get_session_status(session_id):
         }
         
         # Adicionar informações extras baseadas no status
-        if session.status in ['completed', 'completed_enhanced']:
+        if session.status in COMPLETED_STATUSES:
             response['documents_available'] = len(session.documents)
             response['has_documentation'] = bool(session.generated_documentation)
             response['is_enhanced'] = session.status == 'completed_enhanced'
             
             # Se é processamento aprimorado, adicionar info do domínio
             if session.status == 'completed_enhanced':
-                validation_path = os.path.join(
-                    app.config['OUTPUT_FOLDER'], 
-                    f"{session_id}_validation_report.json"
-                )
+                validation_path = session_output_path(session_id, "validation_report.json")
                 if os.path.exists(validation_path):
                     response['has_validation_report'] = True
         
-        return jsonify(response)
+        response = jsonify(response)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        return response
         
     except Exception as e:
         app.logger.error(f"Erro ao obter status: {str(e)}")
@@ -756,16 +983,16 @@ def get_session_status(session_id):
 def get_session_result(session_id):
     """Obtém resultado de uma sessão processada"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
-        if session.status not in ['completed', 'completed_enhanced']:
+        if session.status not in COMPLETED_STATUSES:
             return jsonify({'error': f'Sessão não completada (status: {session.status})'}), 400
         
-        # Carregar dados processados
-        processed_actions = json.loads(session.processed_actions) if session.processed_actions else []
-        ocr_results = json.loads(session.ocr_results) if session.ocr_results else []
+        # Carregar dados processados (sessões antigas guardam as ações na coluna JSON)
+        processed_actions = [action.to_dict() for action in session.actions] or session.processed_actions or []
+        ocr_results = session.ocr_results or []
         
         return jsonify({
             'session_id': session_id,
@@ -790,8 +1017,8 @@ def get_session_result(session_id):
 def export_document(session_id, format):
     """Exporta documento em formato específico"""
     try:
-        session = Session.query.get(session_id)
-        if not session or session.status not in ['completed', 'completed_enhanced']:
+        session = db.session.get(Session, session_id)
+        if not session or session.status not in COMPLETED_STATUSES:
             return jsonify({'error': 'Sessão não encontrada ou não completada'}), 404
         
         # Buscar documento no formato solicitado
@@ -803,13 +1030,11 @@ def export_document(session_id, format):
         if not doc:
             return jsonify({'error': f'Documento no formato {format} não encontrado'}), 404
         
-        if format == 'docx' and doc.file_path and os.path.exists(doc.file_path):
-            return send_file(
-                doc.file_path,
-                as_attachment=True,
-                download_name=f"documentacao_rpa_{session_id}.docx",
-                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
+        if format == 'docx' and doc.file_path:
+            try:
+                return send_artifact(OUTPUT_DIR, doc.file_path, f"documentacao_rpa_{session_id}.docx")
+            except NotFound:
+                return jsonify({'error': 'Formato não disponível para download'}), 400
         
         elif format == 'markdown':
             return jsonify({'content': doc.content, 'format': 'markdown'})
@@ -825,7 +1050,7 @@ def export_document(session_id, format):
 def review_session(session_id):
     """Página de revisão de uma sessão"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return "Sessão não encontrada", 404
         
@@ -839,93 +1064,107 @@ def review_session(session_id):
 def get_validation_report(session_id):
     """Obtém relatório de validação para sessão processada com MVP_02"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
         # Verificar se existe relatório de validação
-        validation_path = os.path.join(
-            app.config['OUTPUT_FOLDER'], 
-            f"{session_id}_validation_report.json"
-        )
+        validation_path = session_output_path(session_id, "validation_report.json")
         
         if not os.path.exists(validation_path):
             return jsonify({'error': 'Relatório de validação não encontrado'}), 404
         
-        # Carregar e retornar relatório
-        with open(validation_path, 'r', encoding='utf-8') as f:
-            validation_data = json.load(f)
-        
-        return jsonify(validation_data)
+        # O relatório já está em JSON no disco: enviar sem decodificar/recodificar
+        return send_file(validation_path, mimetype='application/json', conditional=True)
         
     except Exception as e:
         app.logger.error(f"Erro ao obter relatório de validação: {str(e)}")
         return jsonify({'error': 'Erro interno'}), 500
 
+@lru_cache(maxsize=1)
+def _domains_payload():
+    """Resposta serializada de /domains (os domínios são fixos em tempo de execução)"""
+    domains = domain_manager.get_available_domains()
+    return orjson.dumps({
+        'domains': domains,
+        'total': len(domains)
+    })
+
 @app.route('/domains')
 def get_available_domains():
     """Lista domínios de processo disponíveis"""
     try:
-        domains = domain_manager.get_available_domains()
-        return jsonify({
-            'domains': domains,
-            'total': len(domains)
-        })
+        return app.response_class(_domains_payload(), mimetype='application/json')
         
     except Exception as e:
         app.logger.error(f"Erro ao obter domínios: {str(e)}")
         return jsonify({'error': 'Erro interno'}), 500
 
+@lru_cache(maxsize=1)
+def _agents_payload(agents):
+    """Resposta serializada de /agents para uma lista de agentes"""
+    agents_info = []
+    
+    for agent in agents:
+        info = prompt_loader.get_agent_info(agent)
+        agents_info.append({
+            'id': agent,
+            'name': info.get('name', agent.title()),
+            'description': info.get('description', 'Sem descrição'),
+            'focus': info.get('focus', 'Não especificado'),
+            'audience': info.get('audience', 'Não especificado')
+        })
+    
+    return orjson.dumps({
+        'agents': agents_info,
+        'total': len(agents_info)
+    })
+
 @app.route('/agents')
 def get_available_agents():
     """Lista agentes de IA disponíveis"""
     try:
-        from mvp.utils.prompt_loader import PromptLoader
-        prompt_loader = PromptLoader()
-        
-        agents = prompt_loader.get_available_agents()
-        agents_info = []
-        
-        for agent in agents:
-            info = prompt_loader.get_agent_info(agent)
-            agents_info.append({
-                'id': agent,
-                'name': info.get('name', agent.title()),
-                'description': info.get('description', 'Sem descrição'),
-                'focus': info.get('focus', 'Não especificado'),
-                'audience': info.get('audience', 'Não especificado')
-            })
-        
-        return jsonify({
-            'agents': agents_info,
-            'total': len(agents_info)
-        })
+        # A própria lista de arquivos de prompt é a chave do cache: o mtime do diretório
+        # não muda de forma confiável (resolução grosseira em alguns sistemas de arquivos)
+        agents = tuple(prompt_loader.get_available_agents())
+        return app.response_class(_agents_payload(agents), mimetype='application/json')
         
     except Exception as e:
         app.logger.error(f"Erro ao obter agentes: {str(e)}")
         return jsonify({'error': 'Erro interno'}), 500
 
+# Resultado da verificação do banco reaproveitado por até 1s entre probes
+HEALTH_DB_TTL = 1.0
+_health_db_cache = {'checked_at': 0.0, 'status': None}
+
+def check_database():
+    """Executa SELECT 1 no máximo uma vez por HEALTH_DB_TTL segundos"""
+    now = time.monotonic()
+    if _health_db_cache['status'] is not None and now - _health_db_cache['checked_at'] < HEALTH_DB_TTL:
+        return _health_db_cache['status']
+    
+    try:
+        db.session.execute(text('SELECT 1'))
+        db_status = 'connected'
+    except Exception as db_error:
+        db_status = f'error: {str(db_error)}'
+    
+    _health_db_cache.update(checked_at=now, status=db_status)
+    return db_status
+
 @app.route('/health')
 def health_check():
     """Health check para monitoramento"""
     try:
         # Verificar conexão com banco
-        try:
-            db.session.execute('SELECT 1')
-            db_status = 'connected'
-        except Exception as db_error:
-            db_status = f'error: {str(db_error)}'
+        db_status = check_database()
         
         # Verificar configuração OpenAI
         api_key = app.config.get('OPENAI_API_KEY')
         has_openai_key = bool(api_key) and api_key != 'your-openai-api-key-here'
         
-        # Verificar Tesseract
-        try:
-            from mvp.processors.ocr import TESSERACT_AVAILABLE
-            tesseract_status = 'available' if TESSERACT_AVAILABLE else 'fallback_mode'
-        except Exception:
-            tesseract_status = 'fallback_mode'
+        # Verificar Tesseract (detectado na importação do módulo de OCR)
+        tesseract_status = 'available' if TESSERACT_AVAILABLE else 'fallback_mode'
         
         return jsonify({
             'status': 'healthy',
@@ -961,6 +1200,10 @@ def internal_error(e):
 
 # ==================== ENDPOINTS DE HISTÓRICO ====================
 
+def _history_cursor(session):
+    """Cursor da paginação do histórico: posição da sessão em (created_at, id)"""
+    return f"{session.created_at.isoformat()}|{session.id}"
+
 @app.route('/history')
 def session_history():
     """Endpoint para listar histórico de sessões"""
@@ -969,24 +1212,62 @@ def session_history():
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 10, type=int), 50)  # Máximo 50 por página
         
-        # Query com ordenação por data mais recente
-        sessions_query = Session.query.order_by(Session.created_at.desc())
-        
-        # Paginação
-        sessions_paginated = sessions_query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+        # Query com ordenação por data mais recente; os JSON grandes (ações, OCR,
+        # config de IA) não são usados na listagem e ficam fora do SELECT
+        sessions_query = Session.query.options(
+            defer(Session.processed_actions),
+            defer(Session.ocr_results),
+            defer(Session.ai_config)
+        ).order_by(Session.created_at.desc(), Session.id.desc())
+        
+        # Paginação por cursor (?before=<created_at ISO>|<id>): busca direta no índice,
+        # sem COUNT(*) nem OFFSET, independente da profundidade. O id desempata sessões
+        # criadas no mesmo instante, que senão seriam puladas entre páginas
+        before = request.args.get('before')
+        if before:
+            before_at, _, before_id = before.partition('|')
+            try:
+                before_dt = datetime.fromisoformat(before_at)
+            except ValueError:
+                return jsonify({'error': 'Cursor inválido'}), 400
+            
+            items = sessions_query.filter(or_(
+                Session.created_at < before_dt,
+                and_(Session.created_at == before_dt, Session.id < before_id)
+            )).limit(per_page + 1).all()
+            has_next = len(items) > per_page
+            items = items[:per_page]
+            pagination = {
+                'per_page': per_page,
+                'has_next': has_next,
+                'next_cursor': _history_cursor(items[-1]) if has_next else None
+            }
+        else:
+            # Paginação por número de página (usada pela tela de histórico)
+            sessions_paginated = sessions_query.paginate(
+                page=page, 
+                per_page=per_page, 
+                error_out=False
+            )
+            items = sessions_paginated.items
+            pagination = {
+                'page': page,
+                'per_page': per_page,
+                'total': sessions_paginated.total,
+                'pages': sessions_paginated.pages,
+                'has_next': sessions_paginated.has_next,
+                'has_prev': sessions_paginated.has_prev,
+                'next_cursor': _history_cursor(items[-1]) if items and sessions_paginated.has_next else None
+            }
         
         # Converter para dicionário
         sessions_data = []
-        for session in sessions_paginated.items:
+        for session in items:
             session_dict = session.to_dict()
             
             # Adicionar informações extras
             if session.screenshot_files:
-                screenshot_paths = json.loads(session.screenshot_files)
+                screenshot_paths = session.screenshot_files
                 session_dict['screenshot_count'] = len(screenshot_paths)
             else:
                 session_dict['screenshot_count'] = 0
@@ -1006,14 +1287,7 @@ def session_history():
         
         return jsonify({
             'sessions': sessions_data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': sessions_paginated.total,
-                'pages': sessions_paginated.pages,
-                'has_next': sessions_paginated.has_next,
-                'has_prev': sessions_paginated.has_prev
-            }
+            'pagination': pagination
         })
         
     except Exception as e:
@@ -1024,7 +1298,13 @@ def session_history():
 def session_details(session_id):
     """Endpoint para detalhes de uma sessão específica"""
     try:
-        session = Session.query.get_or_404(session_id)
+        # Logs e documentos carregados junto com a sessão (sem consultas separadas)
+        session = db.session.get(
+            Session, session_id,
+            options=[selectinload(Session.logs), selectinload(Session.documents)]
+        )
+        if not session:
+            return jsonify({'error': 'Sessão não encontrada'}), 404
         
         # Dados básicos da sessão
         session_data = session.to_dict()
@@ -1040,37 +1320,34 @@ def session_details(session_id):
             })
         
         if session.screenshot_files:
-            screenshot_paths = json.loads(session.screenshot_files)
+            screenshot_paths = session.screenshot_files
+            present = existing_files(screenshot_paths)
             for i, path in enumerate(screenshot_paths):
                 files_info.append({
                     'type': 'screenshot',
                     'filename': os.path.basename(path),
                     'path': path,
                     'index': i,
-                    'exists': os.path.exists(path)
+                    'exists': path in present
                 })
         
         session_data['files'] = files_info
         
         # Adicionar logs de processamento
-        logs = ProcessingLog.query.filter_by(session_id=session_id)\
-                                 .order_by(ProcessingLog.timestamp.asc())\
-                                 .all()
-        
-        session_data['logs'] = [log.to_dict() for log in logs]
+        session_data['logs'] = [log.to_dict() for log in session.logs]
         
         # Adicionar documentos gerados
-        documents = ProcessedDocument.query.filter_by(session_id=session_id).all()
         session_data['documents'] = []
         
-        for doc in documents:
+        for doc in session.documents:
+            exists, size = file_stat(doc.file_path)
             doc_info = {
                 'id': doc.id,
                 'format': doc.format,
                 'file_path': doc.file_path,
                 'created_at': doc.created_at.isoformat() if doc.created_at else None,
-                'exists': bool(doc.file_path and os.path.exists(doc.file_path)),
-                'size': os.path.getsize(doc.file_path) if doc.file_path and os.path.exists(doc.file_path) else 0
+                'exists': exists,
+                'size': size
             }
             session_data['documents'].append(doc_info)
         
@@ -1084,9 +1361,10 @@ def session_details(session_id):
 def download_file(session_id, file_type):
     """Endpoint para download de arquivos de uma sessão"""
     try:
-        session = Session.query.get_or_404(session_id)
+        session = db.get_or_404(Session, session_id)
         file_path = None
         filename = None
+        folder = app.config['UPLOAD_FOLDER']
         
         if file_type == 'transcription':
             if session.transcription_file and os.path.exists(session.transcription_file):
@@ -1097,14 +1375,11 @@ def download_file(session_id, file_type):
                 
         elif file_type == 'documentation':
             if session.generated_documentation:
-                # Criar arquivo temporário com a documentação
-                temp_path = os.path.join(app.config['OUTPUT_FOLDER'], f"doc_{session_id}.md")
-                os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-                
-                with open(temp_path, 'w', encoding='utf-8') as f:
-                    f.write(session.generated_documentation)
-                
-                file_path = temp_path
+                # Gravado ao fim do processamento; sessões antigas são materializadas uma única vez
+                folder = OUTPUT_DIR
+                file_path = documentation_path(session_id)
+                if not os.path.exists(file_path):
+                    write_documentation_file(session_id, session.generated_documentation)
                 filename = f"documentacao_{session_id}.md"
             else:
                 return jsonify({'error': 'Documentação não encontrada'}), 404
@@ -1114,7 +1389,7 @@ def download_file(session_id, file_type):
             try:
                 screenshot_index = int(file_type.split('_')[1])
                 if session.screenshot_files:
-                    screenshot_paths = json.loads(session.screenshot_files)
+                    screenshot_paths = session.screenshot_files
                     if 0 <= screenshot_index < len(screenshot_paths):
                         screenshot_path = screenshot_paths[screenshot_index]
                         if os.path.exists(screenshot_path):
@@ -1131,13 +1406,9 @@ def download_file(session_id, file_type):
         else:
             return jsonify({'error': 'Tipo de arquivo inválido'}), 400
         
-        if file_path and os.path.exists(file_path):
-            return send_file(
-                file_path,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/octet-stream'
-            )
+        # Cada ramo acima já verificou a existência do arquivo
+        if file_path:
+            return send_artifact(folder, file_path, filename)
         else:
             return jsonify({'error': 'Arquivo não encontrado'}), 404
             
@@ -8,7 +8,6 @@ from flask import Flask, request, jsonify, render_template, send_file
 from flask_sqlalchemy import SQLAlchemy
 import os
 import uuid
-import json
 import time
 from datetime import datetime
 from werkzeug.utils import secure_filename
@@ -20,7 +19,7 @@ from config_stable import config
 
 # Imports MVP (com tratamento de erro)
 try:
-    from mvp.models import db, Session, ProcessedDocument, ProcessingLog
+    from mvp.models import db, register_sqlite_pragmas, upgrade_json_columns, Session, ProcessedDocument, ProcessingLog
     from mvp.utils.logging_helper import SessionLogger
     from mvp.parsers.transcription import BasicTranscriptionParser
     from mvp.processors.ocr import BasicOCR
@@ -45,7 +44,9 @@ def create_stable_app(config_name='stable'):
     # Criar tabelas
     with app.app_context():
         try:
+            register_sqlite_pragmas()
             db.create_all()
+            upgrade_json_columns()
             logging.info("Database inicializado com sucesso")
         except Exception as e:
             logging.error(f"Erro ao criar database: {e}")
@@ -141,7 +142,7 @@ def upload_files():
             status='uploading', 
             transcription_only_mode=transcription_only_mode
         )
-        session.ai_config = json.dumps(ai_config)
+        session.ai_config = ai_config
         
         uploaded_files = {
             'transcription': None,
@@ -180,7 +181,7 @@ def upload_files():
                     except Exception as e:
                         logging.error(f"Erro ao salvar screenshot {i}: {e}")
         
-        session.screenshot_files = json.dumps(screenshot_paths)
+        session.screenshot_files = screenshot_paths
         
         # Validação
         if transcription_only_mode:
@@ -219,7 +220,7 @@ def process_session(session_id):
     """Processamento SÍNCRONO para estabilidade"""
     try:
         # Buscar sessão
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
@@ -259,7 +260,7 @@ def process_session_sync(session_id):
     try:
         logging.info(f"Iniciando processamento síncrono da sessão {session_id}")
         
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return {'success': False, 'error': 'Sessão não encontrada'}
         
@@ -268,20 +269,9 @@ def process_session_sync(session_id):
         if session.transcription_file and os.path.exists(session.transcription_file):
             try:
                 parser = get_transcription_parser()
-                transcription_result = parser.process_file(session.transcription_file)
+                actions = parser.extract_actions(parser.iter_segments(session.transcription_file))
                 
-                # Importar com tratamento seguro
-                from mvp.parsers.transcription import TranscriptionSegment
-                
-                actions = parser.extract_actions([
-                    TranscriptionSegment(
-                        timestamp=seg['timestamp'],
-                        speaker=seg['speaker'],
-                        text=seg['text']
-                    ) for seg in transcription_result['segments']
-                ])
-                
-                session.processed_actions = json.dumps([
+                session.processed_actions = [
                     {
                         'action_type': action.action_type,
                         'element': action.element,
@@ -291,7 +281,7 @@ def process_session_sync(session_id):
                         'confidence': action.confidence,
                         'raw_text': action.raw_text
                     } for action in actions
-                ])
+                ]
                 
                 logging.info(f"Transcrição processada: {len(actions)} ações extraídas")
                 
@@ -306,7 +296,7 @@ def process_session_sync(session_id):
         ocr_results = []
         if not session.transcription_only_mode and session.screenshot_files:
             try:
-                screenshot_paths = json.loads(session.screenshot_files)
+                screenshot_paths = session.screenshot_files
                 ocr_processor = get_ocr_processor()
                 
                 for path in screenshot_paths:
@@ -314,7 +304,7 @@ def process_session_sync(session_id):
                         ocr_result = ocr_processor.extract_text(path)
                         ocr_results.append(ocr_result)
                 
-                session.ocr_results = json.dumps([
+                session.ocr_results = [
                     {
                         'image_path': result.original_image_path,
                         'extracted_text': result.extracted_text,
@@ -329,14 +319,14 @@ def process_session_sync(session_id):
                         ],
                         'processing_time': result.processing_time
                     } for result in ocr_results
-                ])
+                ]
                 
                 logging.info(f"OCR processado: {len(ocr_results)} imagens")
                 
             except Exception as e:
                 logging.error(f"Erro no processamento OCR: {e}")
                 # OCR não é crítico, continuar sem ele
-                session.ocr_results = json.dumps([])
+                session.ocr_results = []
         
         # 3. Correlação
         if actions or ocr_results:
@@ -348,7 +338,7 @@ def process_session_sync(session_id):
                 logging.info(f"Correlação concluída: {correlated_process.successfully_correlated} ações")
                 
                 # 4. Gerar documentação
-                ai_config = json.loads(session.ai_config) if session.ai_config else {}
+                ai_config = session.ai_config or {}
                 
                 ai_gen = get_ai_generator(
                     provider=ai_config.get('provider', 'openai'),
@@ -427,7 +417,7 @@ def process_session_sync(session_id):
         
         # Atualizar status de erro
         try:
-            session = Session.query.get(session_id)
+            session = db.session.get(Session, session_id)
             if session:
                 session.status = 'error'
                 session.error_message = str(e)
@@ -443,7 +433,7 @@ def process_session_sync(session_id):
 def get_session_status(session_id):
     """Status da sessão"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
@@ -464,7 +454,7 @@ def get_session_status(session_id):
 def get_session_result(session_id):
     """Resultado da sessão"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
@@ -486,7 +476,7 @@ def get_session_result(session_id):
 def export_document(session_id, format):
     """Export de documento"""
     try:
-        session = Session.query.get(session_id)
+        session = db.session.get(Session, session_id)
         if not session or session.status != 'completed':
             return jsonify({'error': 'Sessão não encontrada ou não completada'}), 404
         
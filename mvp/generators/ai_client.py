@@ -1,12 +1,259 @@
-import openai
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Generator, Iterator, List, Optional, Tuple, TYPE_CHECKING
+from collections import OrderedDict
 from dataclasses import dataclass
+from importlib.util import find_spec
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from functools import lru_cache
+import atexit
+import hashlib
 import json
+import logging
+import os
+import threading
 import time
 import re
 from mvp.processors.correlator import CorrelatedProcess, CorrelatedEvent
 from mvp.utils.prompt_loader import PromptLoader
 
+logger = logging.getLogger(__name__)
+
+# openai/httpx (pydantic, anyio, certifi...) só são importados quando um cliente
+# é criado; OPENAI_EAGER_IMPORT=1 força o import no carregamento (útil em CI)
+if TYPE_CHECKING or os.getenv('OPENAI_EAGER_IMPORT'):
+    import openai
+    import httpx
+
+# Padrões usados na limpeza e na extração de metadata do conteúdo gerado
+_RE_MD_OPEN = re.compile(r'^```markdown\s*\n', re.MULTILINE)
+_RE_MD_CLOSE = re.compile(r'\n```\s*$', re.MULTILINE)
+_RE_MULTI_NL = re.compile(r'\n{3,}')
+_RE_SECTIONS = re.compile(r'^## (.+)$', re.MULTILINE)
+_RE_STEPS = re.compile(r'^\d+\. ', re.MULTILINE)
+
+# Seções que todo documento gerado deve conter (na ordem em que são completadas)
+_REQUIRED_SECTIONS = ('# ', '## Objetivo', '## Pré-requisitos', '## Passos Detalhados')
+
+# h2 habilita HTTP/2 no httpx; verificado sem importar o pacote
+HTTP2_AVAILABLE = find_spec('h2') is not None
+
+# Cliente HTTP único do processo: geradores (e chaves) diferentes reaproveitam
+# as conexões keep-alive, evitando novo handshake TCP/TLS a cada geração
+HTTP_TIMEOUT_SECONDS = 60.0
+HTTP_CONNECT_TIMEOUT_SECONDS = 10.0
+HTTP_MAX_CONNECTIONS = 8
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client() -> 'httpx.Client':
+    """Retorna o cliente HTTP compartilhado (criado na primeira chamada)"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                import httpx
+                _http_client = httpx.Client(
+                    http2=HTTP2_AVAILABLE,
+                    timeout=httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_CONNECTIONS
+                    )
+                )
+                atexit.register(_http_client.close)
+    return _http_client
+
+# Clientes da API por (provedor, hash da chave), reaproveitados entre geradores
+_client_cache = {}
+_client_cache_lock = threading.Lock()
+
+# Geradores reutilizados por (provedor, modelo, agente, hash da chave); limitado para
+# não acumular instâncias de chaves personalizadas enviadas pelos usuários
+AI_GENERATOR_CACHE_SIZE = 16
+_generator_cache: "OrderedDict[tuple, AIDocumentGenerator]" = OrderedDict()
+_generator_cache_lock = threading.Lock()
+
+# Blocos do prompt contextualizado: só os valores substituídos variam por chamada
+_PROCESS_INFO_TEMPLATE = """
+**INFORMAÇÕES DO PROCESSO:**
+- Total de ações identificadas: {total}
+- Ações correlacionadas com sucesso: {correlated}
+- Qualidade da correlação: {quality:.2f}
+- Participantes identificados: {speakers}
+"""
+
+_CONTEXT_TEMPLATE = """
+**CONTEXTO ADICIONAL:**
+- Tipos de ação mais comuns: {action_types}
+- Confiança média das ações: {average_confidence:.2f}
+"""
+
+_TEMPLATE_BASE_SECTION = """
+**TEMPLATE BASE PARA SEGUIR:**
+{template_base}
+
+**IMPORTANTE:** Use o template acima como base estrutural, mas personalize o conteúdo com os dados específicos do processo analisado.
+"""
+
+_PROMPT_INSTRUCTIONS = """
+**INSTRUÇÕES ESPECÍFICAS PARA ESTE PROCESSO:**
+Com base nas informações acima, gere uma documentação completa para automação RPA.
+
+IMPORTANTE:
+- Nome do processo: Identifique e sugira um nome baseado nas ações
+- Foque nos elementos que têm correlação visual confirmada (score > 0.5)
+- Para ações sem correlação visual, use o texto mencionado na transcrição
+- Inclua validações para elementos críticos (botões de confirmação, campos obrigatórios)
+- Sugira tratamento para possíveis erros (elemento não encontrado, timeout, etc.)
+- Use terminologia técnica apropriada para RPA
+"""
+
+# Nota do checklist por faixa de correlação: < 0.5, [0.5, 0.8), >= 0.8
+_CORRELATION_NOTES = ("❌ Baixa confiança - revisar", "⚠️ Verificar manualmente", "✅ Alta confiança")
+
+# Resumo executivo montado localmente; só os campos de texto livre vêm da API
+_EXECUTIVE_SUMMARY_TEMPLATE = """# Resumo Executivo - Automação RPA
+
+## Processo Identificado
+{process}
+
+## Benefícios da Automação
+{benefits}
+
+## Complexidade
+- **Nível:** {complexity}
+- **Tempo estimado desenvolvimento:** {development_time}
+- **ROI esperado:** {expected_roi}
+
+## Próximos Passos
+{next_steps}"""
+
+# (tempo estimado de desenvolvimento, ROI esperado) por nível de complexidade
+_EXECUTIVE_ESTIMATES = {
+    "Baixa": ("1-2 semanas", "Alto"),
+    "Média": ("3-4 semanas", "Médio"),
+    "Alta": ("6-8 semanas", "Baixo")
+}
+_EXECUTIVE_DEFAULT_BENEFITS = (
+    "Redução do tempo de execução do processo",
+    "Diminuição de erros manuais",
+    "Liberação da equipe para atividades de maior valor"
+)
+_EXECUTIVE_DEFAULT_NEXT_STEPS = (
+    "Validar a documentação com a área de negócio",
+    "Desenvolver o robô RPA",
+    "Testar e implantar a automação"
+)
+
+# Limite de linhas da sequência de ações e das telas no prompt: acima de
+# HEAD + TAIL, entram as HEAD primeiras e as TAIL últimas
+PROMPT_HEAD_EVENTS = 40
+PROMPT_TAIL_EVENTS = 10
+PROMPT_HEAD_SCREENS = 20
+PROMPT_TAIL_SCREENS = 10
+
+# Janela de contexto (prompt + resposta) dos modelos mais usados; modelos fora
+# da tabela usam DEFAULT_CONTEXT_LIMIT (janelas atuais são de 128k ou mais)
+DEFAULT_CONTEXT_LIMIT = 128000
+MODEL_CONTEXT_LIMITS = {
+    'gpt-4': 8192,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+    'gpt-3.5-turbo': 16385
+}
+
+# Modelos que aceitam response_format={"type": "json_object"} (o gpt-4 original não aceita)
+_JSON_MODE_MODEL_PREFIXES = (
+    'gpt-4o', 'gpt-4-turbo', 'gpt-4-1106', 'gpt-4-0125', 'gpt-4.', 'gpt-5',
+    'gpt-3.5-turbo-1106', 'gpt-3.5-turbo-0125', 'o1', 'o3', 'o4'
+)
+
+def _context_limit(model: str) -> int:
+    """Janela de contexto do modelo: nome exato, senão o prefixo mais longo da tabela
+    (ex.: 'gpt-4o-2024-08-06' -> 'gpt-4o'), senão DEFAULT_CONTEXT_LIMIT"""
+    if model in MODEL_CONTEXT_LIMITS:
+        return MODEL_CONTEXT_LIMITS[model]
+    prefixes = [name for name in MODEL_CONTEXT_LIMITS if model.startswith(name + '-')]
+    if prefixes:
+        return MODEL_CONTEXT_LIMITS[max(prefixes, key=len)]
+    return DEFAULT_CONTEXT_LIMIT
+
+def _supports_json_mode(model: str) -> bool:
+    """Indica se o modelo aceita o modo JSON da API de chat"""
+    return model == 'gpt-3.5-turbo' or model.startswith(_JSON_MODE_MODEL_PREFIXES)
+
+def _parse_json_object(text: Optional[str]) -> Dict[str, Any]:
+    """Extrai o objeto JSON da resposta (tolera cercas ```json e texto ao redor)"""
+    if not text:
+        return {}
+    start = text.find('{')
+    end = text.rfind('}')
+    if start < 0 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+@lru_cache(maxsize=None)
+def _tokenizer_for(model: str):
+    """Tokenizador BPE do modelo via tiktoken (importado só na primeira estimativa);
+    None se o tiktoken não estiver disponível"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Ex.: arquivo BPE não está em cache e não há acesso à rede
+        return None
+
+def _event_signature(event: CorrelatedEvent) -> Tuple[str, str]:
+    """Chave que agrupa eventos consecutivos repetidos (mesma ação no mesmo elemento)"""
+    return event.action.action_type, event.action.element
+
+def _head_tail(items: List[Any], head: int, tail: int) -> Tuple[List[Any], int]:
+    """Acima de head + tail itens, mantém o início e o fim separados por None
+    (marcador do trecho omitido). Retorna (itens listados, itens omitidos)."""
+    if len(items) > head + tail:
+        skipped = len(items) - head - tail
+        return items[:head] + [None] + items[-tail:], skipped
+    return items, 0
+
+def _prompt_event_runs(events,
+                       head: int = PROMPT_HEAD_EVENTS,
+                       tail: int = PROMPT_TAIL_EVENTS) -> Tuple[List[Optional[Tuple[CorrelatedEvent, int]]], int]:
+    """Agrupa eventos consecutivos repetidos em (evento, repetições) e limita a lista
+    com _head_tail. Retorna (grupos listados, grupos omitidos)."""
+    runs = []
+    for _, group in groupby(events, key=_event_signature):
+        first = next(group)
+        runs.append((first, 1 + sum(1 for _ in group)))
+    
+    return _head_tail(runs, head, tail)
+
+def _summary_fields(summary: Dict[str, Any]) -> Tuple[List[str], List[str], float]:
+    """Lê uma única vez (speakers, action_types, average_confidence) do resumo da transcrição"""
+    return (
+        summary.get('speakers', ()),
+        summary.get('action_types', ()),
+        summary.get('average_confidence', 0)
+    )
+
+# Diretório do cache de respostas da IA; opt-in: sem PREVC_AI_CACHE (ou vazio),
+# toda geração chama a API e gerar de novo um documento traz uma nova resposta
+AI_CACHE_DIR = os.getenv("PREVC_AI_CACHE")
+
 @dataclass
 class DocumentationResult:
     """Resultado da geração de documentação"""
@@ -21,6 +268,9 @@ class DocumentationResult:
 class AIDocumentGenerator:
     """Cliente para geração de documentação usando diferentes provedores de IA"""
     
+    # Respostas da API guardadas em disco pelo hash do pedido
+    _cache_dir = Path(AI_CACHE_DIR).expanduser() if AI_CACHE_DIR else None
+    
     def __init__(self, api_key: str, provider: str = "openai", model: str = "gpt-4", agent_type: str = "rpa_general"):
         self.api_key = api_key
         self.provider = provider.lower()
@@ -40,15 +290,13 @@ class AIDocumentGenerator:
 
     def _initialize_client(self):
         """Inicializa o cliente baseado no provedor"""
-        if self.provider == "openai":
-            self.client = openai.OpenAI(api_key=self.api_key)
-        elif self.provider == "azure":
-            # Para Azure OpenAI, você precisará configurar endpoint e versão da API
-            self.client = openai.AzureOpenAI(
-                api_key=self.api_key,
-                # azure_endpoint="https://your-endpoint.openai.azure.com/",
-                # api_version="2024-02-15-preview"
-            )
+        if self.provider in ("openai", "azure"):
+            # Geradores com o mesmo provedor e chave compartilham o cliente da API
+            key = (self.provider, hashlib.sha256(self.api_key.encode('utf-8')).hexdigest())
+            with _client_cache_lock:
+                self.client = _client_cache.get(key)
+                if self.client is None:
+                    self.client = _client_cache[key] = self._create_client()
         elif self.provider == "anthropic":
             # Para Anthropic, você precisará instalar a biblioteca anthropic
             # import anthropic
@@ -62,6 +310,21 @@ class AIDocumentGenerator:
         else:
             raise ValueError(f"Provedor não suportado: {self.provider}")
 
+    def _create_client(self):
+        """Cria o cliente da API (OpenAI ou Azure) sobre o cliente HTTP compartilhado"""
+        import openai
+        
+        if self.provider == "azure":
+            # Para Azure OpenAI, você precisará configurar endpoint e versão da API
+            return openai.AzureOpenAI(
+                api_key=self.api_key,
+                http_client=get_http_client(),
+                # azure_endpoint="https://your-endpoint.openai.azure.com/",
+                # api_version="2024-02-15-preview"
+            )
+        
+        return openai.OpenAI(api_key=self.api_key, http_client=get_http_client())
+
     def _load_agent_prompt(self) -> str:
         """Carrega o prompt do agente especificado"""
         loaded_prompt = self.prompt_loader.load_prompt(self.agent_type)
@@ -131,8 +394,31 @@ Sua tarefa é gerar uma documentação técnica estruturada e clara baseada nas
     def generate_documentation(self, 
                              correlated_data: CorrelatedProcess, 
                              custom_prompt: Optional[str] = None,
-                             template_base: Optional[str] = None) -> DocumentationResult:
-        """Gera documentação baseada nos dados correlacionados"""
+                             template_base: Optional[str] = None,
+                             force_refresh: bool = False) -> DocumentationResult:
+        """Gera documentação baseada nos dados correlacionados
+        
+        Com o cache ativado (PREVC_AI_CACHE), pedidos idênticos (modelo, parâmetros
+        e prompts) reaproveitam a resposta guardada em disco, a menos que
+        force_refresh seja informado.
+        """
+        stream = self.generate_documentation_stream(correlated_data, custom_prompt, template_base, force_refresh)
+        while True:
+            try:
+                next(stream)
+            except StopIteration as finished:
+                return finished.value
+
+    def generate_documentation_stream(self, 
+                                    correlated_data: CorrelatedProcess, 
+                                    custom_prompt: Optional[str] = None,
+                                    template_base: Optional[str] = None,
+                                    force_refresh: bool = False) -> Generator[str, None, DocumentationResult]:
+        """Gera documentação entregando o texto à medida que chega da API (stream=True)
+        
+        Os trechos entregues são brutos, antes da limpeza; o DocumentationResult
+        final, já validado, é o valor de retorno do gerador (use `yield from`).
+        """
         start_time = time.time()
         
         try:
@@ -142,19 +428,39 @@ Sua tarefa é gerar uma documentação técnica estruturada e clara baseada nas
             # Construir prompt contextualizado
             user_prompt = self._build_contextualized_prompt(correlated_data, template_base)
             
-            # Fazer chamada para OpenAI
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature
-            )
+            # Prompts que não cabem na janela do modelo são encurtados (menos ações e
+            # telas no início/fim) e só recusados se nem a versão mínima couber
+            system_tokens = self.estimate_tokens(system_prompt)
+            prompt_tokens = system_tokens + self.estimate_tokens(user_prompt)
+            prompt_limit = _context_limit(self.model) - self.max_tokens
+            if prompt_tokens > prompt_limit:
+                logger.warning("Prompt com ~%d tokens excede o limite de %d do modelo %s; encurtando",
+                               prompt_tokens, prompt_limit, self.model)
+                shrink = 1
+                while prompt_tokens > prompt_limit and shrink < PROMPT_HEAD_EVENTS:
+                    shrink *= 2
+                    user_prompt = self._build_contextualized_prompt(correlated_data, template_base, shrink)
+                    prompt_tokens = system_tokens + self.estimate_tokens(user_prompt)
+                if prompt_tokens > prompt_limit:
+                    raise ValueError(f"Prompt muito grande (~{prompt_tokens} tokens, limite {prompt_limit})")
+            
+            cache_key = self._cache_key(system_prompt, user_prompt)
+            cached = None if force_refresh else self._load_cached_response(cache_key)
             
-            # Extrair conteúdo da resposta
-            generated_content = response.choices[0].message.content
+            if cached is not None:
+                generated_content = cached['content']
+                token_usage = {"cached": 1}
+                yield generated_content
+            else:
+                # Fazer chamada para OpenAI, repassando cada trecho recebido
+                parts = []
+                token_usage = {}
+                for delta in self._iter_completion(system_prompt, user_prompt, token_usage):
+                    parts.append(delta)
+                    yield delta
+                
+                generated_content = "".join(parts)
+                self._store_cached_response(cache_key, generated_content, token_usage)
             
             # Validar e limpar conteúdo
             cleaned_content = self._validate_and_clean_content(generated_content)
@@ -170,11 +476,7 @@ Sua tarefa é gerar uma documentação técnica estruturada e clara baseada nas
                 format="markdown",
                 metadata=metadata,
                 generation_time=generation_time,
-                token_usage={
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                },
+                token_usage=token_usage,
                 success=True
             )
             
@@ -189,88 +491,159 @@ Sua tarefa é gerar uma documentação técnica estruturada e clara baseada nas
                 error_message=str(e)
             )
 
+    def _iter_completion(self, system_prompt: str, user_prompt: str, token_usage: Dict[str, int]) -> Iterator[str]:
+        """Chama a API em modo stream e gera os trechos de texto; o uso de tokens
+        (enviado no último chunk) é gravado em token_usage"""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        
+        for chunk in response:
+            if chunk.usage:
+                token_usage.update(
+                    prompt_tokens=chunk.usage.prompt_tokens,
+                    completion_tokens=chunk.usage.completion_tokens,
+                    total_tokens=chunk.usage.total_tokens
+                )
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+
+    def _cache_key(self, system_prompt: str, user_prompt: str) -> str:
+        """Hash que identifica o pedido feito à API"""
+        request_id = f"{self.provider}|{self.model}|{self.temperature}|{self.max_tokens}|{system_prompt}|{user_prompt}"
+        return hashlib.sha256(request_id.encode('utf-8')).hexdigest()
+
+    def _load_cached_response(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Lê resposta guardada para o pedido (None se não houver)"""
+        if self._cache_dir is None:
+            return None
+        try:
+            with open(self._cache_dir / f"{cache_key}.json", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store_cached_response(self, cache_key: str, content: str, token_usage: Dict[str, int]):
+        """Guarda a resposta de forma atômica (falhas de escrita não afetam a geração)"""
+        if self._cache_dir is None:
+            return
+        target = self._cache_dir / f"{cache_key}.json"
+        tmp_path = target.with_name(f"{cache_key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'content': content, 'token_usage': token_usage}, f, ensure_ascii=False)
+            os.replace(tmp_path, target)
+        except OSError as e:
+            logger.warning("Não foi possível gravar cache da IA: %s", e)
+
     def _build_contextualized_prompt(self, 
                                     correlated_data: CorrelatedProcess, 
-                                    template_base: Optional[str] = None) -> str:
-        """Constrói prompt contextualizado baseado nos dados"""
+                                    template_base: Optional[str] = None,
+                                    shrink: int = 1) -> str:
+        """Constrói prompt contextualizado baseado nos dados
+        
+        shrink divide as quantidades de ações e telas mantidas no início e no fim
+        (mínimo de 1 cada), para encurtar prompts que excedem a janela do modelo.
+        """
+        speakers, action_types, average_confidence = _summary_fields(correlated_data.transcription_summary)
         
         # Informações básicas do processo
-        process_info = f"""
-**INFORMAÇÕES DO PROCESSO:**
-- Total de ações identificadas: {correlated_data.total_actions}
-- Ações correlacionadas com sucesso: {correlated_data.successfully_correlated}
-- Qualidade da correlação: {correlated_data.correlation_quality:.2f}
-- Participantes identificados: {', '.join(correlated_data.transcription_summary.get('speakers', []))}
-"""
+        process_info = _PROCESS_INFO_TEMPLATE.format(
+            total=correlated_data.total_actions,
+            correlated=correlated_data.successfully_correlated,
+            quality=correlated_data.correlation_quality,
+            speakers=', '.join(speakers)
+        )
+        
+        # Sequência de ações: repetições consecutivas viram uma linha e, em processos
+        # longos, só o início e o fim entram no prompt (custo de tokens limitado)
+        listed, skipped = _prompt_event_runs(
+            correlated_data.correlated_events,
+            max(1, PROMPT_HEAD_EVENTS // shrink),
+            max(1, PROMPT_TAIL_EVENTS // shrink)
+        )
         
-        # Sequência de ações
-        actions_sequence = "\n**SEQUÊNCIA DE AÇÕES IDENTIFICADAS:**\n"
-        for i, event in enumerate(correlated_data.correlated_events, 1):
+        actions_parts = ["\n**SEQUÊNCIA DE AÇÕES IDENTIFICADAS:**\n"]
+        append = actions_parts.append
+        i = 0
+        for run in listed:
+            if run is None:
+                append(f"... ({skipped} ações intermediárias omitidas) ...\n")
+                i += skipped
+                continue
+            
+            event, repeats = run
+            i += 1
             action = event.action
             ui_element = event.matched_ui_element
             
-            actions_sequence += f"{i}. **{action.action_type.upper()}** "
-            actions_sequence += f"'{action.element}' "
-            
             if ui_element:
-                actions_sequence += f"(Elemento visual: '{ui_element.text}', "
-                actions_sequence += f"Tipo: {ui_element.type}, "
-                actions_sequence += f"Confiança: {event.correlation_score:.2f}) "
+                visual = (
+                    f"(Elemento visual: '{ui_element.text}', "
+                    f"Tipo: {ui_element.type}, "
+                    f"Confiança: {event.correlation_score:.2f}) "
+                )
             else:
-                actions_sequence += "(Sem correlação visual) "
-                
-            actions_sequence += f"- Falado por: {action.speaker}\n"
+                visual = "(Sem correlação visual) "
+            
+            repeated = f" ({repeats}× seguidas)" if repeats > 1 else ""
+            append(
+                f"{i}. **{action.action_type.upper()}** '{action.element}'{repeated} {visual}- Falado por: {action.speaker}\n"
+            )
+        actions_sequence = "".join(actions_parts)
         
-        # Informações visuais
-        visual_info = "\n**ELEMENTOS VISUAIS IDENTIFICADOS:**\n"
-        for i, ocr_summary in enumerate(correlated_data.ocr_summary, 1):
-            visual_info += f"Tela {i}: {ocr_summary['ui_elements_count']} elementos UI identificados "
-            visual_info += f"(Tipos: {', '.join(ocr_summary.get('ui_elements_types', []))})\n"
+        # Informações visuais (mesmo corte de início/fim das ações)
+        screens, skipped_screens = _head_tail(
+            list(enumerate(correlated_data.ocr_summary, 1)),
+            max(1, PROMPT_HEAD_SCREENS // shrink),
+            max(1, PROMPT_TAIL_SCREENS // shrink)
+        )
+        visual_parts = ["\n**ELEMENTOS VISUAIS IDENTIFICADOS:**\n"]
+        for screen in screens:
+            if screen is None:
+                visual_parts.append(f"... ({skipped_screens} telas intermediárias omitidas) ...\n")
+                continue
+            i, ocr_summary = screen
+            visual_parts.append(
+                f"Tela {i}: {ocr_summary['ui_elements_count']} elementos UI identificados "
+                f"(Tipos: {', '.join(ocr_summary.get('ui_elements_types', []))})\n"
+            )
+        visual_info = "".join(visual_parts)
         
         # Contexto adicional
-        context = "\n**CONTEXTO ADICIONAL:**\n"
-        context += f"- Tipos de ação mais comuns: {', '.join(correlated_data.transcription_summary.get('action_types', []))}\n"
-        context += f"- Confiança média das ações: {correlated_data.transcription_summary.get('average_confidence', 0):.2f}\n"
-        
-        # Instruções específicas
-        instructions = f"""
-**INSTRUÇÕES ESPECÍFICAS PARA ESTE PROCESSO:**
-Com base nas informações acima, gere uma documentação completa para automação RPA.
-
-IMPORTANTE:
-- Nome do processo: Identifique e sugira um nome baseado nas ações
-- Foque nos elementos que têm correlação visual confirmada (score > 0.5)
-- Para ações sem correlação visual, use o texto mencionado na transcrição
-- Inclua validações para elementos críticos (botões de confirmação, campos obrigatórios)
-- Sugira tratamento para possíveis erros (elemento não encontrado, timeout, etc.)
-- Use terminologia técnica apropriada para RPA
-"""
+        context = _CONTEXT_TEMPLATE.format(
+            action_types=', '.join(action_types),
+            average_confidence=average_confidence
+        )
         
         # Adicionar template base se fornecido
-        template_section = ""
-        if template_base:
-            template_section = f"""
-**TEMPLATE BASE PARA SEGUIR:**
-{template_base}
-
-**IMPORTANTE:** Use o template acima como base estrutural, mas personalize o conteúdo com os dados específicos do processo analisado.
-"""
+        template_section = _TEMPLATE_BASE_SECTION.format(template_base=template_base) if template_base else ""
         
-        # Montar prompt final
-        full_prompt = process_info + actions_sequence + visual_info + context + template_section + instructions
+        # Montar prompt final (instruções específicas são fixas)
+        full_prompt = "".join((process_info, actions_sequence, visual_info, context, template_section, _PROMPT_INSTRUCTIONS))
         
         return full_prompt
 
     def _validate_and_clean_content(self, content: str) -> str:
         """Valida e limpa o conteúdo gerado"""
         # Remover marcadores de código markdown se presentes incorretamente
-        content = re.sub(r'^```markdown\s*\n', '', content, flags=re.MULTILINE)
-        content = re.sub(r'\n```\s*$', '', content, flags=re.MULTILINE)
+        if '```' in content:
+            content = _RE_MD_OPEN.sub('', content)
+            content = _RE_MD_CLOSE.sub('', content)
         
         # Garantir que há seções obrigatórias
-        required_sections = ['# ', '## Objetivo', '## Pré-requisitos', '## Passos Detalhados']
-        
-        for section in required_sections:
+        for section in _REQUIRED_SECTIONS:
             if section not in content:
                 # Se seção crítica estiver faltando, adicionar placeholder
                 if section == '# ':
@@ -283,7 +656,8 @@ IMPORTANTE:
                     content += "\n\n## Passos Detalhados\n1. Seguir sequência identificada na análise"
         
         # Limpar espaços excessivos
-        content = re.sub(r'\n{3,}', '\n\n', content)
+        if '\n\n\n' in content:
+            content = _RE_MULTI_NL.sub('\n\n', content)
         content = content.strip()
         
         return content
@@ -292,10 +666,10 @@ IMPORTANTE:
         """Extrai metadata do processo de geração"""
         
         # Contar seções geradas
-        sections = re.findall(r'^## (.+)$', generated_content, re.MULTILINE)
+        sections = _RE_SECTIONS.findall(generated_content)
         
         # Contar passos
-        steps = re.findall(r'^\d+\. ', generated_content, re.MULTILINE)
+        steps_count = sum(1 for _ in _RE_STEPS.finditer(generated_content))
         
         return {
             'process_quality': {
@@ -307,7 +681,7 @@ IMPORTANTE:
             'document_structure': {
                 'sections_generated': len(sections),
                 'sections_list': sections,
-                'steps_count': len(steps),
+                'steps_count': steps_count,
                 'word_count': len(generated_content.split()),
                 'character_count': len(generated_content)
             },
@@ -320,76 +694,110 @@ IMPORTANTE:
 
     def generate_multiple_formats(self, correlated_data: CorrelatedProcess) -> Dict[str, DocumentationResult]:
         """Gera documentação em múltiplos formatos"""
-        results = {}
-        
-        # Formato padrão (markdown técnico)
-        results['technical'] = self.generate_documentation(correlated_data)
-        
-        # Formato executivo (mais resumido)
-        results['executive'] = self._generate_executive_summary(correlated_data)
-        
-        # Formato checklist (para validação)
-        results['checklist'] = self._generate_validation_checklist(correlated_data)
-        
-        return results
+        # As duas chamadas à API são independentes: disparadas em paralelo,
+        # o tempo total passa a ser o da mais lenta e não a soma
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            # Formato padrão (markdown técnico)
+            technical = pool.submit(self.generate_documentation, correlated_data)
+            
+            # Formato executivo (mais resumido)
+            executive = pool.submit(self._generate_executive_summary, correlated_data)
+            
+            # Formato checklist (para validação, local)
+            checklist = self._generate_validation_checklist(correlated_data)
+            
+            return {
+                'technical': technical.result(),
+                'executive': executive.result(),
+                'checklist': checklist
+            }
 
     def _generate_executive_summary(self, correlated_data: CorrelatedProcess) -> DocumentationResult:
-        """Gera resumo executivo do processo"""
+        """Gera resumo executivo do processo
+        
+        A estrutura e a complexidade saem dos números da correlação; a API só
+        preenche os campos de texto livre (processo, benefícios e próximos passos).
+        """
         start_time = time.time()
+        metadata = {'type': 'executive_summary'}
         
         try:
+            total_actions = correlated_data.total_actions
+            if total_actions < 10:
+                complexity = "Baixa"
+            elif total_actions < 30:
+                complexity = "Média"
+            else:
+                complexity = "Alta"
+            development_time, expected_roi = _EXECUTIVE_ESTIMATES[complexity]
+            
+            summary = correlated_data.transcription_summary
+            elements = [event.action.element for event in correlated_data.correlated_events[:15]]
             prompt = f"""
-Baseado no processo RPA analisado, gere um RESUMO EXECUTIVO conciso:
+Baseado no processo RPA analisado, responda em JSON com as chaves:
+- "processo": nome/descrição do processo em 1 linha
+- "beneficios": lista com 3 benefícios da automação
+- "proximos_passos": lista com 3 próximos passos
 
 **Dados do processo:**
-- {correlated_data.total_actions} ações identificadas
+- {total_actions} ações identificadas
 - {correlated_data.successfully_correlated} ações com correlação visual
 - Qualidade da correlação: {correlated_data.correlation_quality:.0%}
-
-**Formato de saída:**
-```markdown
-# Resumo Executivo - Automação RPA
-
-## Processo Identificado
-[Nome/descrição em 1 linha]
-
-## Benefícios da Automação
-- [Benefício 1]
-- [Benefício 2]
-- [Benefício 3]
-
-## Complexidade
-- **Nível:** [Baixa/Média/Alta]
-- **Tempo estimado desenvolvimento:** [X semanas]
-- **ROI esperado:** [Alto/Médio/Baixo]
-
-## Próximos Passos
-1. [Passo 1]
-2. [Passo 2]
-3. [Passo 3]
-```
+- Tipos de ação: {', '.join(summary.get('action_types', []))}
+- Elementos mencionados: {', '.join(elements)}
 """
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=800,
-                temperature=0.3
-            )
+            request = {
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": 200,
+                "temperature": 0.3
+            }
+            if self.provider == "openai" and _supports_json_mode(self.model):
+                request["response_format"] = {"type": "json_object"}
+            
+            # Falha na API ainda monta o resumo com os textos padrão, mas o resultado
+            # volta com success=False e o erro, para o chamador não tratá-lo como gerado
+            token_usage = {}
+            api_error_message = None
+            try:
+                response = self.client.chat.completions.create(**request)
+                fields = _parse_json_object(response.choices[0].message.content)
+                token_usage = {
+                    "prompt_tokens": response.usage.prompt_tokens,
+                    "completion_tokens": response.usage.completion_tokens,
+                    "total_tokens": response.usage.total_tokens
+                }
+            except Exception as api_error:
+                fields = {}
+                api_error_message = str(api_error)
+                metadata['fallback_reason'] = api_error_message
+                logger.warning("Resumo executivo sem resposta da API, usando textos padrão: %s", api_error)
+            
+            benefits = fields.get('beneficios')
+            if not benefits or not isinstance(benefits, list):
+                benefits = _EXECUTIVE_DEFAULT_BENEFITS
+            next_steps = fields.get('proximos_passos')
+            if not next_steps or not isinstance(next_steps, list):
+                next_steps = _EXECUTIVE_DEFAULT_NEXT_STEPS
             
-            content = response.choices[0].message.content
+            content = _EXECUTIVE_SUMMARY_TEMPLATE.format(
+                process=fields.get('processo') or "Processo RPA identificado na transcrição",
+                benefits="\n".join(f"- {benefit}" for benefit in benefits[:3]),
+                complexity=complexity,
+                development_time=development_time,
+                expected_roi=expected_roi,
+                next_steps="\n".join(f"{i}. {step}" for i, step in enumerate(next_steps[:3], 1))
+            )
             
             return DocumentationResult(
-                content=self._validate_and_clean_content(content),
+                content=content,
                 format="markdown",
-                metadata={'type': 'executive_summary'},
+                metadata=metadata,
                 generation_time=time.time() - start_time,
-                token_usage={
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                },
-                success=True
+                token_usage=token_usage,
+                success=api_error_message is None,
+                error_message=api_error_message
             )
             
         except Exception as e:
@@ -407,21 +815,13 @@ Baseado no processo RPA analisado, gere um RESUMO EXECUTIVO conciso:
         """Gera checklist para validação do processo"""
         start_time = time.time()
         
-        # Gerar checklist baseado nas ações identificadas
-        checklist_items = []
-        
-        for event in correlated_data.correlated_events:
-            action = event.action
-            correlation_note = ""
-            
-            if event.correlation_score >= 0.8:
-                correlation_note = "✅ Alta confiança"
-            elif event.correlation_score >= 0.5:
-                correlation_note = "⚠️ Verificar manualmente"
-            else:
-                correlation_note = "❌ Baixa confiança - revisar"
-            
-            checklist_items.append(f"- [ ] {action.action_type.title()} em '{action.element}' {correlation_note}")
+        # Gerar checklist baseado nas ações identificadas; a nota vem do índice 0/1/2
+        # conforme os limiares 0.5 e 0.8
+        checklist_items = [
+            f"- [ ] {event.action.action_type.title()} em '{event.action.element}' "
+            f"{_CORRELATION_NOTES[(event.correlation_score >= 0.5) + (event.correlation_score >= 0.8)]}"
+            for event in correlated_data.correlated_events
+        ]
         
         content = f"""# Checklist de Validação - Processo RPA
 
@@ -458,6 +858,10 @@ Baseado no processo RPA analisado, gere um RESUMO EXECUTIVO conciso:
 
     def estimate_tokens(self, text: str) -> int:
         """Estima número de tokens para um texto"""
+        tokenizer = _tokenizer_for(self.model)
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, disallowed_special=()))
+        
         # Estimativa aproximada: ~4 caracteres por token em português
         return len(text) // 4
 
@@ -468,4 +872,20 @@ Baseado no processo RPA analisado, gere um RESUMO EXECUTIVO conciso:
             'max_tokens': self.max_tokens,
             'temperature': self.temperature,
             'estimated_cost_per_1k_tokens': 0.03  # Valor aproximado GPT-4
-        }
\ No newline at end of file
+        }
+
+def get_cached_generator(api_key: str, provider: str = "openai", model: str = "gpt-4",
+                         agent_type: str = "rpa_general") -> AIDocumentGenerator:
+    """Obtém gerador AI reaproveitando instâncias com os mesmos parâmetros (LRU limitado)"""
+    key = (provider, model, agent_type, hashlib.sha256(api_key.encode('utf-8')).hexdigest())
+    with _generator_cache_lock:
+        generator = _generator_cache.get(key)
+        if generator is not None:
+            _generator_cache.move_to_end(key)
+            return generator
+        
+        generator = AIDocumentGenerator(api_key=api_key, provider=provider, model=model, agent_type=agent_type)
+        _generator_cache[key] = generator
+        if len(_generator_cache) > AI_GENERATOR_CACHE_SIZE:
+            _generator_cache.popitem(last=False)
+        return generator
@@ -3,11 +3,26 @@ Sistema de templates personalizáveis por domínio
 Versão 2 - Templates específicos para diferentes tipos de processos RPA
 """
 
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
-import json
+from typing import Callable, Dict, Any, Iterable, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import logging
+import orjson
 import os
+import re
+import sys
+import threading
 from enum import Enum
+from functools import cache
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
 
 class ProcessDomain(Enum):
     """Domínios de processo suportados"""
@@ -21,352 +36,498 @@ class ProcessDomain(Enum):
     INTEGRATION = "integration"
     GENERIC = "generic"
 
-@dataclass
+# Condições de seção conhecidas; condições desconhecidas não bloqueiam a seção
+_CONDITION_FNS: Dict[str, Callable[[Dict[str, Any]], bool]] = {
+    "has_security_elements": lambda context: bool(context.get('security_elements')),
+    "has_validation_fields": lambda context: bool(context.get('validation_fields')),
+    "has_audit_requirements": lambda context: bool(context.get('audit_required')),
+}
+
+def _always_true(context: Dict[str, Any]) -> bool:
+    return True
+
+def _compile_conditions(conditions: Iterable[str]) -> Callable[[Dict[str, Any]], bool]:
+    """Compila a lista de condições de uma seção em um único predicado"""
+    fns = tuple(_CONDITION_FNS[condition] for condition in conditions if condition in _CONDITION_FNS)
+    if not fns:
+        return _always_true
+    if len(fns) == 1:
+        return fns[0]
+    return lambda context: all(fn(context) for fn in fns)
+
+@dataclass(slots=True, frozen=True)
 class TemplateSection:
-    """Seção de template"""
+    """Seção de template (imutável)"""
     title: str
     content_template: str
     is_required: bool
     order: int
-    conditions: List[str]  # Condições para incluir a seção
+    conditions: Sequence[str]  # Condições para incluir a seção
+    predicate: Callable[[Dict[str, Any]], bool] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Títulos e conteúdos repetidos entre templates (inclusive importados) compartilham um único objeto
+        object.__setattr__(self, 'title', sys.intern(self.title))
+        object.__setattr__(self, 'content_template', sys.intern(self.content_template))
+        object.__setattr__(self, 'conditions', tuple(sys.intern(condition) for condition in self.conditions))
+        object.__setattr__(self, 'predicate', _compile_conditions(self.conditions))
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DomainTemplate:
-    """Template para um domínio específico"""
+    """Template para um domínio específico
+    
+    Imutável: as listas são guardadas como tuplas. prompt_modifications continua
+    um dict e não deve ser alterado depois da construção.
+    """
     domain: ProcessDomain
     name: str
     description: str
-    sections: List[TemplateSection]
+    sections: Sequence[TemplateSection]
     prompt_modifications: Dict[str, str]
-    validation_rules: List[str]
-    expected_elements: List[str]
-    complexity_indicators: List[str]
+    validation_rules: Sequence[str]
+    expected_elements: Sequence[str]
+    complexity_indicators: Sequence[str]
 
-class DomainTemplateManager:
-    """Gerenciador de templates por domínio"""
+    def __post_init__(self):
+        # Seções ordenadas uma única vez na construção (ordenação estável por order)
+        object.__setattr__(self, 'sections', tuple(sorted(self.sections, key=lambda section: section.order)))
+        object.__setattr__(self, 'validation_rules', tuple(self.validation_rules))
+        object.__setattr__(self, 'expected_elements', tuple(self.expected_elements))
+        object.__setattr__(self, 'complexity_indicators', tuple(self.complexity_indicators))
+
+# Quantidade máxima de domínios identificados mantidos em cache por gerenciador
+DOMAIN_CACHE_SIZE = 1024
+
+# Placeholders aceitos nos templates de seção, substituídos em uma única passada
+_PLACEHOLDER_RE = re.compile(
+    r"\{(?:system_name|form_name|process_name|amount|financial_operation|origin_account"
+    r"|destination_account|purpose|processing_date|required_fields|detailed_steps)\}"
+)
+
+# Bonificações por padrões específicos: (domínio, palavras, bônus)
+_DOMAIN_BONUSES = (
+    (ProcessDomain.AUTHENTICATION, ('login', 'senha', 'entrar', 'usuário'), 0.3),
+    (ProcessDomain.FORM_FILLING, ('formulário', 'preencher', 'campo', 'dados'), 0.3),
+    (ProcessDomain.FINANCIAL, ('valor', 'pagamento', 'transferir', 'conta'), 0.3),
+)
+
+# Regras de validação: palavras aceitas e aviso emitido quando nenhuma aparece
+_VALIDATION_RULES = {
+    "deve_conter_validacao_credenciais": (
+        ('credenciais', 'usuário', 'senha', 'login'),
+        "Documentação pode não incluir validação adequada de credenciais"
+    ),
+    "deve_incluir_tratamento_erro_login": (
+        ('erro', 'falha', 'inválido', 'bloqueado'),
+        "Falta tratamento de erros de login"
+    ),
+    "deve_listar_campos_obrigatorios": (
+        ('obrigatório', 'required', 'necessário'),
+        "Pode não listar campos obrigatórios adequadamente"
+    ),
+    "deve_validar_valores_monetarios": (
+        ('valor', 'saldo', 'limite', 'validar'),
+        "Falta validação de valores monetários"
+    ),
+}
+
+class _KeywordMatcher:
+    """Encontra, em uma única varredura, quais palavras de um conjunto aparecem no texto
     
-    def __init__(self):
-        self.templates = {}
-        self._initialize_default_templates()
-        
-        # Indicadores para classificação automática de domínio
-        self.domain_indicators = {
-            ProcessDomain.AUTHENTICATION: [
-                'login', 'senha', 'usuário', 'entrar', 'autenticar', 'acesso',
-                'credenciais', 'autenticação', 'logar', 'password', 'user'
-            ],
-            ProcessDomain.FORM_FILLING: [
-                'formulário', 'preencher', 'dados', 'informações', 'campo',
-                'cadastro', 'registro', 'form', 'input', 'preenchimento'
-            ],
-            ProcessDomain.DATA_ENTRY: [
-                'inserir', 'dados', 'tabela', 'planilha', 'entrada', 'digitar',
-                'input', 'registro', 'informar', 'incluir', 'adicionar'
-            ],
-            ProcessDomain.FINANCIAL: [
-                'pagamento', 'financeiro', 'valor', 'moeda', 'dinheiro', 'conta',
-                'fatura', 'cobrança', 'transação', 'saldo', 'extrato'
-            ],
-            ProcessDomain.REPORTING: [
-                'relatório', 'report', 'exportar', 'gerar', 'imprimir',
-                'dados', 'consulta', 'listagem', 'download', 'pdf'
-            ],
-            ProcessDomain.NAVIGATION: [
-                'navegar', 'menu', 'página', 'tela', 'aba', 'seção',
-                'ir para', 'acessar', 'abrir', 'voltar', 'próximo'
-            ],
-            ProcessDomain.VALIDATION: [
-                'validar', 'verificar', 'conferir', 'checar', 'confirmar',
-                'validação', 'erro', 'correto', 'aprovado', 'rejeitado'
-            ],
-            ProcessDomain.INTEGRATION: [
-                'integração', 'api', 'sistema', 'conectar', 'sincronizar',
-                'importar', 'exportar', 'transferir', 'enviar', 'receber'
-            ]
+    Usa um autômato Aho-Corasick (pyahocorasick) quando disponível; caso contrário,
+    uma regex com lookahead. Como cada posição retorna só a palavra mais longa,
+    cada palavra também marca as palavras contidas nela (ex.: 'formulário' -> 'form').
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        keywords = {word for word in keywords if word}
+        self._contained = {
+            word: frozenset(other for other in keywords if other in word)
+            for word in keywords
         }
+        self._automaton = None
+        self._pattern = None
+        
+        if not keywords:
+            return
+        if AHOCORASICK_AVAILABLE:
+            automaton = ahocorasick.Automaton()
+            for word in keywords:
+                automaton.add_word(word, word)
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            ordered = sorted(keywords, key=len, reverse=True)
+            self._pattern = re.compile("(?=(" + "|".join(map(re.escape, ordered)) + "))")
 
-    def _initialize_default_templates(self):
-        """Inicializa templates padrão para cada domínio"""
-        
-        # Template de Autenticação
-        auth_template = DomainTemplate(
-            domain=ProcessDomain.AUTHENTICATION,
-            name="Processo de Autenticação",
-            description="Template para processos de login e autenticação",
-            sections=[
-                TemplateSection(
-                    title="Objetivo",
-                    content_template="Realizar autenticação no sistema {system_name} utilizando credenciais válidas.",
-                    is_required=True,
-                    order=1,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Pré-requisitos",
-                    content_template="""- Sistema {system_name} acessível
+    def find(self, text: str) -> set:
+        """Retorna as palavras presentes em text (mesma semântica de `word in text`)"""
+        if self._automaton is not None:
+            matches = {word for _, word in self._automaton.iter(text)} if text else set()
+        elif self._pattern is not None:
+            matches = set(self._pattern.findall(text))
+        else:
+            return set()
+        
+        found = set()
+        for word in matches:
+            found.update(self._contained[word])
+        return found
+
+@cache
+def _build_auth_template() -> DomainTemplate:
+    """Template de Autenticação"""
+    return DomainTemplate(
+        domain=ProcessDomain.AUTHENTICATION,
+        name="Processo de Autenticação",
+        description="Template para processos de login e autenticação",
+        sections=[
+            TemplateSection(
+                title="Objetivo",
+                content_template="Realizar autenticação no sistema {system_name} utilizando credenciais válidas.",
+                is_required=True,
+                order=1,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Pré-requisitos",
+                content_template="""- Sistema {system_name} acessível
 - Credenciais válidas (usuário e senha)
 - Conexão com internet estável
 - Navegador web atualizado""",
-                    is_required=True,
-                    order=2,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Passos de Autenticação",
-                    content_template="{detailed_steps}",
-                    is_required=True,
-                    order=3,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Validações de Segurança",
-                    content_template="""- Verificar se a URL está correta (https)
+                is_required=True,
+                order=2,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Passos de Autenticação",
+                content_template="{detailed_steps}",
+                is_required=True,
+                order=3,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Validações de Segurança",
+                content_template="""- Verificar se a URL está correta (https)
 - Confirmar que não há mensagens de erro de certificado
 - Validar se o login foi bem-sucedido
 - Verificar se não há tentativas de login suspeitas""",
-                    is_required=True,
-                    order=4,
-                    conditions=["has_security_elements"]
-                ),
-                TemplateSection(
-                    title="Tratamento de Erros de Autenticação",
-                    content_template="""- **Credenciais inválidas**: Verificar usuário e senha, tentar novamente
+                is_required=True,
+                order=4,
+                conditions=["has_security_elements"]
+            ),
+            TemplateSection(
+                title="Tratamento de Erros de Autenticação",
+                content_template="""- **Credenciais inválidas**: Verificar usuário e senha, tentar novamente
 - **Conta bloqueada**: Aguardar ou contatar administrador
 - **Sistema indisponível**: Verificar conectividade e tentar mais tarde
 - **Timeout**: Reiniciar processo de login""",
-                    is_required=True,
-                    order=5,
-                    conditions=[]
-                )
-            ],
-            prompt_modifications={
-                "focus": "autenticação e segurança",
-                "emphasis": "Enfatize aspectos de segurança, validação de credenciais e tratamento de erros de login",
-                "security_note": "Inclua considerações específicas sobre segurança da informação"
-            },
-            validation_rules=[
-                "deve_conter_validacao_credenciais",
-                "deve_incluir_tratamento_erro_login",
-                "deve_verificar_sucesso_autenticacao"
-            ],
-            expected_elements=[
-                "campo_usuario", "campo_senha", "botao_entrar", "botao_login",
-                "link_esqueci_senha", "mensagem_erro", "indicador_sucesso"
-            ],
-            complexity_indicators=[
-                "autenticacao_dois_fatores", "captcha", "multiplas_tentativas"
-            ]
-        )
-        
-        # Template de Preenchimento de Formulário
-        form_template = DomainTemplate(
-            domain=ProcessDomain.FORM_FILLING,
-            name="Preenchimento de Formulário",
-            description="Template para processos de preenchimento de formulários",
-            sections=[
-                TemplateSection(
-                    title="Objetivo",
-                    content_template="Preencher formulário {form_name} com as informações necessárias e realizar envio.",
-                    is_required=True,
-                    order=1,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Dados Necessários",
-                    content_template="""- {required_fields}
+                is_required=True,
+                order=5,
+                conditions=[]
+            )
+        ],
+        prompt_modifications={
+            "focus": "autenticação e segurança",
+            "emphasis": "Enfatize aspectos de segurança, validação de credenciais e tratamento de erros de login",
+            "security_note": "Inclua considerações específicas sobre segurança da informação"
+        },
+        validation_rules=[
+            "deve_conter_validacao_credenciais",
+            "deve_incluir_tratamento_erro_login",
+            "deve_verificar_sucesso_autenticacao"
+        ],
+        expected_elements=[
+            "campo_usuario", "campo_senha", "botao_entrar", "botao_login",
+            "link_esqueci_senha", "mensagem_erro", "indicador_sucesso"
+        ],
+        complexity_indicators=[
+            "autenticacao_dois_fatores", "captcha", "multiplas_tentativas"
+        ]
+    )
+
+@cache
+def _build_form_template() -> DomainTemplate:
+    """Template de Preenchimento de Formulário"""
+    return DomainTemplate(
+        domain=ProcessDomain.FORM_FILLING,
+        name="Preenchimento de Formulário",
+        description="Template para processos de preenchimento de formulários",
+        sections=[
+            TemplateSection(
+                title="Objetivo",
+                content_template="Preencher formulário {form_name} com as informações necessárias e realizar envio.",
+                is_required=True,
+                order=1,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Dados Necessários",
+                content_template="""- {required_fields}
 - Documentos de apoio (se aplicável)
 - Informações de validação""",
-                    is_required=True,
-                    order=2,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Passos de Preenchimento",
-                    content_template="{detailed_steps}",
-                    is_required=True,
-                    order=3,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Validações de Campos",
-                    content_template="""- Verificar se campos obrigatórios estão preenchidos
+                is_required=True,
+                order=2,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Passos de Preenchimento",
+                content_template="{detailed_steps}",
+                is_required=True,
+                order=3,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Validações de Campos",
+                content_template="""- Verificar se campos obrigatórios estão preenchidos
 - Validar formato de dados (e-mail, CPF, telefone, etc.)
 - Confirmar consistência entre campos relacionados
 - Verificar limites de caracteres""",
-                    is_required=True,
-                    order=4,
-                    conditions=["has_validation_fields"]
-                ),
-                TemplateSection(
-                    title="Envio e Confirmação",
-                    content_template="""- Revisar dados antes do envio
+                is_required=True,
+                order=4,
+                conditions=["has_validation_fields"]
+            ),
+            TemplateSection(
+                title="Envio e Confirmação",
+                content_template="""- Revisar dados antes do envio
 - Clicar em botão de envio/submissão
 - Aguardar confirmação de recebimento
 - Salvar comprovante (se disponível)""",
-                    is_required=True,
-                    order=5,
-                    conditions=[]
-                )
-            ],
-            prompt_modifications={
-                "focus": "preenchimento preciso e validação de dados",
-                "emphasis": "Enfatize a importância da precisão dos dados e validações de campo",
-                "data_note": "Inclua considerações sobre tipos de dados e formatos esperados"
-            },
-            validation_rules=[
-                "deve_listar_campos_obrigatorios",
-                "deve_incluir_validacoes_formato",
-                "deve_confirmar_envio_sucesso"
-            ],
-            expected_elements=[
-                "campos_input", "botao_enviar", "botao_limpar", "checkbox_termos",
-                "dropdown_opcoes", "mensagem_validacao", "confirmacao_envio"
-            ],
-            complexity_indicators=[
-                "campos_condicionais", "upload_arquivos", "multiplas_etapas"
-            ]
-        )
-        
-        # Template Financeiro
-        financial_template = DomainTemplate(
-            domain=ProcessDomain.FINANCIAL,
-            name="Processo Financeiro",
-            description="Template para processos financeiros e transações",
-            sections=[
-                TemplateSection(
-                    title="Objetivo",
-                    content_template="Realizar {financial_operation} no valor de {amount} conforme procedimentos financeiros estabelecidos.",
-                    is_required=True,
-                    order=1,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Informações Financeiras",
-                    content_template="""- Valor da transação: {amount}
+                is_required=True,
+                order=5,
+                conditions=[]
+            )
+        ],
+        prompt_modifications={
+            "focus": "preenchimento preciso e validação de dados",
+            "emphasis": "Enfatize a importância da precisão dos dados e validações de campo",
+            "data_note": "Inclua considerações sobre tipos de dados e formatos esperados"
+        },
+        validation_rules=[
+            "deve_listar_campos_obrigatorios",
+            "deve_incluir_validacoes_formato",
+            "deve_confirmar_envio_sucesso"
+        ],
+        expected_elements=[
+            "campos_input", "botao_enviar", "botao_limpar", "checkbox_termos",
+            "dropdown_opcoes", "mensagem_validacao", "confirmacao_envio"
+        ],
+        complexity_indicators=[
+            "campos_condicionais", "upload_arquivos", "multiplas_etapas"
+        ]
+    )
+
+@cache
+def _build_financial_template() -> DomainTemplate:
+    """Template Financeiro"""
+    return DomainTemplate(
+        domain=ProcessDomain.FINANCIAL,
+        name="Processo Financeiro",
+        description="Template para processos financeiros e transações",
+        sections=[
+            TemplateSection(
+                title="Objetivo",
+                content_template="Realizar {financial_operation} no valor de {amount} conforme procedimentos financeiros estabelecidos.",
+                is_required=True,
+                order=1,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Informações Financeiras",
+                content_template="""- Valor da transação: {amount}
 - Conta de origem: {origin_account}
 - Conta de destino: {destination_account}
 - Finalidade: {purpose}
 - Data de processamento: {processing_date}""",
-                    is_required=True,
-                    order=2,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Passos da Transação",
-                    content_template="{detailed_steps}",
-                    is_required=True,
-                    order=3,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Validações Financeiras",
-                    content_template="""- Verificar saldo disponível
+                is_required=True,
+                order=2,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Passos da Transação",
+                content_template="{detailed_steps}",
+                is_required=True,
+                order=3,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Validações Financeiras",
+                content_template="""- Verificar saldo disponível
 - Confirmar dados bancários
 - Validar limites de transação
 - Verificar taxa de câmbio (se aplicável)
 - Confirmar finalidade da operação""",
-                    is_required=True,
-                    order=4,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Controles de Auditoria",
-                    content_template="""- Registrar log da transação
+                is_required=True,
+                order=4,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Controles de Auditoria",
+                content_template="""- Registrar log da transação
 - Salvar comprovantes e recibos
 - Documentar aprovações necessárias
 - Manter rastreabilidade da operação""",
-                    is_required=True,
-                    order=5,
-                    conditions=["has_audit_requirements"]
-                )
-            ],
-            prompt_modifications={
-                "focus": "precisão financeira e conformidade",
-                "emphasis": "Enfatize controles financeiros, validações monetárias e rastreabilidade",
-                "compliance_note": "Inclua considerações de compliance e auditoria financeira"
-            },
-            validation_rules=[
-                "deve_validar_valores_monetarios",
-                "deve_incluir_controles_auditoria",
-                "deve_confirmar_transacao_sucesso"
-            ],
-            expected_elements=[
-                "campo_valor", "campo_conta", "botao_transferir", "botao_confirmar",
-                "comprovante_transacao", "saldo_disponivel", "historico_transacoes"
-            ],
-            complexity_indicators=[
-                "multiplas_moedas", "aprovacao_hierarquica", "integracao_bancaria"
-            ]
-        )
-        
-        # Template Genérico
-        generic_template = DomainTemplate(
-            domain=ProcessDomain.GENERIC,
-            name="Processo Genérico",
-            description="Template padrão para processos não classificados",
-            sections=[
-                TemplateSection(
-                    title="Objetivo",
-                    content_template="Executar processo {process_name} conforme procedimentos estabelecidos.",
-                    is_required=True,
-                    order=1,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Pré-requisitos",
-                    content_template="""- Sistema acessível
+                is_required=True,
+                order=5,
+                conditions=["has_audit_requirements"]
+            )
+        ],
+        prompt_modifications={
+            "focus": "precisão financeira e conformidade",
+            "emphasis": "Enfatize controles financeiros, validações monetárias e rastreabilidade",
+            "compliance_note": "Inclua considerações de compliance e auditoria financeira"
+        },
+        validation_rules=[
+            "deve_validar_valores_monetarios",
+            "deve_incluir_controles_auditoria",
+            "deve_confirmar_transacao_sucesso"
+        ],
+        expected_elements=[
+            "campo_valor", "campo_conta", "botao_transferir", "botao_confirmar",
+            "comprovante_transacao", "saldo_disponivel", "historico_transacoes"
+        ],
+        complexity_indicators=[
+            "multiplas_moedas", "aprovacao_hierarquica", "integracao_bancaria"
+        ]
+    )
+
+@cache
+def _build_generic_template() -> DomainTemplate:
+    """Template Genérico"""
+    return DomainTemplate(
+        domain=ProcessDomain.GENERIC,
+        name="Processo Genérico",
+        description="Template padrão para processos não classificados",
+        sections=[
+            TemplateSection(
+                title="Objetivo",
+                content_template="Executar processo {process_name} conforme procedimentos estabelecidos.",
+                is_required=True,
+                order=1,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Pré-requisitos",
+                content_template="""- Sistema acessível
 - Permissões necessárias
 - Dados/informações requeridas
 - Conexão estável""",
-                    is_required=True,
-                    order=2,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Passos Detalhados",
-                    content_template="{detailed_steps}",
-                    is_required=True,
-                    order=3,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Validações",
-                    content_template="""- Verificar se processo foi executado corretamente
+                is_required=True,
+                order=2,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Passos Detalhados",
+                content_template="{detailed_steps}",
+                is_required=True,
+                order=3,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Validações",
+                content_template="""- Verificar se processo foi executado corretamente
 - Confirmar resultados esperados
 - Validar dados de saída""",
-                    is_required=True,
-                    order=4,
-                    conditions=[]
-                ),
-                TemplateSection(
-                    title="Tratamento de Exceções",
-                    content_template="""- **Erro de sistema**: Verificar logs e tentar novamente
+                is_required=True,
+                order=4,
+                conditions=[]
+            ),
+            TemplateSection(
+                title="Tratamento de Exceções",
+                content_template="""- **Erro de sistema**: Verificar logs e tentar novamente
 - **Dados inválidos**: Corrigir informações e reprocessar
 - **Timeout**: Reiniciar processo
 - **Falha de conectividade**: Verificar conexão e tentar mais tarde""",
-                    is_required=True,
-                    order=5,
-                    conditions=[]
-                )
-            ],
-            prompt_modifications={
-                "focus": "clareza e completude",
-                "emphasis": "Enfatize clareza dos passos e tratamento abrangente de exceções"
-            },
-            validation_rules=[
-                "deve_ter_objetivo_claro",
-                "deve_incluir_validacoes_basicas",
-                "deve_tratar_excecoes_comuns"
-            ],
-            expected_elements=[],
-            complexity_indicators=[]
-        )
+                is_required=True,
+                order=5,
+                conditions=[]
+            )
+        ],
+        prompt_modifications={
+            "focus": "clareza e completude",
+            "emphasis": "Enfatize clareza dos passos e tratamento abrangente de exceções"
+        },
+        validation_rules=[
+            "deve_ter_objetivo_claro",
+            "deve_incluir_validacoes_basicas",
+            "deve_tratar_excecoes_comuns"
+        ],
+        expected_elements=[],
+        complexity_indicators=[]
+    )
+
+# Templates padrão por domínio, construídos no primeiro acesso e compartilhados
+# entre gerenciadores (são imutáveis)
+_DEFAULT_TEMPLATE_BUILDERS = {
+    ProcessDomain.AUTHENTICATION: _build_auth_template,
+    ProcessDomain.FORM_FILLING: _build_form_template,
+    ProcessDomain.FINANCIAL: _build_financial_template,
+    ProcessDomain.GENERIC: _build_generic_template,
+}
+
+class DomainTemplateManager:
+    """Gerenciador de templates por domínio"""
+    
+    def __init__(self):
+        # Templates importados e padrões já construídos (os padrões são criados sob demanda)
+        self.templates = {}
         
-        # Registrar templates
-        self.templates[ProcessDomain.AUTHENTICATION] = auth_template
-        self.templates[ProcessDomain.FORM_FILLING] = form_template
-        self.templates[ProcessDomain.FINANCIAL] = financial_template
-        self.templates[ProcessDomain.GENERIC] = generic_template
+        # Indicadores para classificação automática de domínio (conjuntos em minúsculas)
+        self.domain_indicators = {
+            ProcessDomain.AUTHENTICATION: frozenset({
+                'login', 'senha', 'usuário', 'entrar', 'autenticar', 'acesso',
+                'credenciais', 'autenticação', 'logar', 'password', 'user'
+            }),
+            ProcessDomain.FORM_FILLING: frozenset({
+                'formulário', 'preencher', 'dados', 'informações', 'campo',
+                'cadastro', 'registro', 'form', 'input', 'preenchimento'
+            }),
+            ProcessDomain.DATA_ENTRY: frozenset({
+                'inserir', 'dados', 'tabela', 'planilha', 'entrada', 'digitar',
+                'input', 'registro', 'informar', 'incluir', 'adicionar'
+            }),
+            ProcessDomain.FINANCIAL: frozenset({
+                'pagamento', 'financeiro', 'valor', 'moeda', 'dinheiro', 'conta',
+                'fatura', 'cobrança', 'transação', 'saldo', 'extrato'
+            }),
+            ProcessDomain.REPORTING: frozenset({
+                'relatório', 'report', 'exportar', 'gerar', 'imprimir',
+                'dados', 'consulta', 'listagem', 'download', 'pdf'
+            }),
+            ProcessDomain.NAVIGATION: frozenset({
+                'navegar', 'menu', 'página', 'tela', 'aba', 'seção',
+                'ir para', 'acessar', 'abrir', 'voltar', 'próximo'
+            }),
+            ProcessDomain.VALIDATION: frozenset({
+                'validar', 'verificar', 'conferir', 'checar', 'confirmar',
+                'validação', 'erro', 'correto', 'aprovado', 'rejeitado'
+            }),
+            ProcessDomain.INTEGRATION: frozenset({
+                'integração', 'api', 'sistema', 'conectar', 'sincronizar',
+                'importar', 'exportar', 'transferir', 'enviar', 'receber'
+            })
+        }
+        self._build_keyword_matcher()
+        
+        # Cache LRU de identify_domain, indexado pelo hash do texto combinado
+        self._domain_cache: "OrderedDict[bytes, ProcessDomain]" = OrderedDict()
+        self._domain_cache_lock = threading.Lock()
+
+    def _build_keyword_matcher(self):
+        """Compila indicadores e palavras de bonificação para uma única varredura do texto"""
+        keywords = {word for indicators in self.domain_indicators.values() for word in indicators}
+        keywords.update(word for _, words, _ in _DOMAIN_BONUSES for word in words)
+        self._keyword_matcher = _KeywordMatcher(keywords)
+        
+        # Matchers de validação por domínio: (template usado, matcher)
+        self._validation_matchers: Dict[ProcessDomain, tuple] = {}
+        
+        # JSON exportado por domínio: (template usado, bytes serializados)
+        self._export_cache: Dict[ProcessDomain, tuple] = {}
+
+    def _find_keywords(self, text: str) -> set:
+        """Retorna os indicadores presentes em text (mesma semântica de `indicator in text`)"""
+        return self._keyword_matcher.find(text)
 
     def identify_domain(self, 
                        transcription_text: str, 
@@ -377,32 +538,64 @@ class DomainTemplateManager:
         # Combinar todo o texto para análise
         all_text = (transcription_text + " " + " ".join(ui_elements) + " " + " ".join(actions)).lower()
         
+        key = hashlib.blake2b(all_text.encode('utf-8'), digest_size=16).digest()
+        with self._domain_cache_lock:
+            domain = self._domain_cache.get(key)
+            if domain is not None:
+                self._domain_cache.move_to_end(key)
+                return domain
+        
+        domain = self._score_domain(all_text)
+        
+        with self._domain_cache_lock:
+            self._domain_cache[key] = domain
+            if len(self._domain_cache) > DOMAIN_CACHE_SIZE:
+                self._domain_cache.popitem(last=False)
+        return domain
+
+    def identify_domains_batch(self,
+                               items: Iterable[Tuple[str, List[str], List[str]]]) -> List[ProcessDomain]:
+        """Identifica o domínio de vários processos (transcription_text, ui_elements, actions)
+        
+        Entradas repetidas no lote são pontuadas uma única vez; as demais passam
+        pelo mesmo cache LRU de identify_domain.
+        """
+        seen: Dict[Tuple[str, Tuple[str, ...], Tuple[str, ...]], ProcessDomain] = {}
+        domains = []
+        for transcription_text, ui_elements, actions in items:
+            key = (transcription_text, tuple(ui_elements), tuple(actions))
+            domain = seen.get(key)
+            if domain is None:
+                domain = self.identify_domain(transcription_text, ui_elements, actions)
+                seen[key] = domain
+            domains.append(domain)
+        return domains
+
+    def clear_domain_cache(self):
+        """Descarta os domínios memorizados por identify_domain"""
+        with self._domain_cache_lock:
+            self._domain_cache.clear()
+
+    def _score_domain(self, all_text: str) -> ProcessDomain:
+        """Pontua os domínios para o texto combinado (já em minúsculas)"""
+        
+        # Uma única varredura do texto encontra todos os indicadores presentes
+        found = self._find_keywords(all_text)
+        
         # Pontuar cada domínio baseado na presença de indicadores
         domain_scores = {}
         
         for domain, indicators in self.domain_indicators.items():
-            score = 0
-            for indicator in indicators:
-                if indicator in all_text:
-                    score += 1
+            score = len(indicators & found)
             
             # Normalizar score pelo número de indicadores do domínio
             normalized_score = score / len(indicators) if indicators else 0
             domain_scores[domain] = normalized_score
         
         # Adicionar bonificações baseadas em padrões específicos
-        
-        # Bonificação para autenticação
-        if any(word in all_text for word in ['login', 'senha', 'entrar', 'usuário']):
-            domain_scores[ProcessDomain.AUTHENTICATION] += 0.3
-        
-        # Bonificação para formulários
-        if any(word in all_text for word in ['formulário', 'preencher', 'campo', 'dados']):
-            domain_scores[ProcessDomain.FORM_FILLING] += 0.3
-        
-        # Bonificação para processos financeiros
-        if any(word in all_text for word in ['valor', 'pagamento', 'transferir', 'conta']):
-            domain_scores[ProcessDomain.FINANCIAL] += 0.3
+        for domain, words, bonus in _DOMAIN_BONUSES:
+            if any(word in found for word in words):
+                domain_scores[domain] += bonus
         
         # Selecionar domínio com maior pontuação
         if domain_scores:
@@ -414,7 +607,10 @@ class DomainTemplateManager:
 
     def get_template(self, domain: ProcessDomain) -> Optional[DomainTemplate]:
         """Obtém template para um domínio específico"""
-        return self.templates.get(domain)
+        template = self.templates.get(domain)
+        if template is None and domain in _DEFAULT_TEMPLATE_BUILDERS:
+            template = self.templates[domain] = _DEFAULT_TEMPLATE_BUILDERS[domain]()
+        return template
 
     def generate_documentation_with_template(self, 
                                            domain: ProcessDomain,
@@ -423,46 +619,56 @@ class DomainTemplateManager:
         
         template = self.get_template(domain)
         if not template:
-            template = self.templates[ProcessDomain.GENERIC]
+            template = self.get_template(ProcessDomain.GENERIC)
         
         documentation_parts = []
+        append = documentation_parts.append
+        
+        # Placeholders resolvidos uma única vez para todas as seções
+        # (detailed_steps pode ser um gerador e só é consumido aqui)
+        replacements = self._build_replacements(context_data)
         
         # Processar cada seção do template
-        for section in sorted(template.sections, key=lambda x: x.order):
-            # Verificar condições da seção
-            if section.conditions and not self._check_conditions(section.conditions, context_data):
+        for section in template.sections:
+            # Verificar condições da seção (predicado compilado na construção)
+            predicate = section.predicate
+            if predicate is not _always_true and not predicate(context_data):
                 continue
             
-            # Gerar conteúdo da seção
-            section_content = self._render_section(section, context_data)
-            documentation_parts.append(f"## {section.title}\n\n{section_content}\n")
-        
-        return "\n".join(documentation_parts)
+            # Gerar conteúdo da seção (fragmentos unidos uma única vez no final)
+            if documentation_parts:
+                append("\n")
+            append("## ")
+            append(section.title)
+            append("\n\n")
+            append(self._render_section(section, context_data, replacements))
+            append("\n")
+        
+        return "".join(documentation_parts)
 
     def _check_conditions(self, conditions: List[str], context_data: Dict[str, Any]) -> bool:
         """Verifica se condições da seção são atendidas"""
-        for condition in conditions:
-            if condition == "has_security_elements":
-                security_elements = context_data.get('security_elements', [])
-                if not security_elements:
-                    return False
-            elif condition == "has_validation_fields":
-                validation_fields = context_data.get('validation_fields', [])
-                if not validation_fields:
-                    return False
-            elif condition == "has_audit_requirements":
-                audit_required = context_data.get('audit_required', False)
-                if not audit_required:
-                    return False
-        
-        return True
-
-    def _render_section(self, section: TemplateSection, context_data: Dict[str, Any]) -> str:
+        return _compile_conditions(conditions)(context_data)
+
+    def _render_section(self,
+                        section: TemplateSection,
+                        context_data: Dict[str, Any],
+                        replacements: Optional[Dict[str, str]] = None) -> str:
         """Renderiza conteúdo de uma seção com dados do contexto"""
         content = section.content_template
         
-        # Substituir placeholders básicos
-        replacements = {
+        # Seções estáticas não têm placeholders
+        if '{' not in content:
+            return content
+        
+        if replacements is None:
+            replacements = self._build_replacements(context_data)
+        
+        return _PLACEHOLDER_RE.sub(lambda match: replacements[match.group(0)], content)
+
+    def _build_replacements(self, context_data: Dict[str, Any]) -> Dict[str, str]:
+        """Resolve os valores dos placeholders a partir do contexto"""
+        return {
             '{system_name}': context_data.get('system_name', 'Sistema'),
             '{form_name}': context_data.get('form_name', 'formulário'),
             '{process_name}': context_data.get('process_name', 'processo'),
@@ -475,11 +681,6 @@ class DomainTemplateManager:
             '{required_fields}': self._format_required_fields(context_data.get('required_fields', [])),
             '{detailed_steps}': self._format_detailed_steps(context_data.get('detailed_steps', []))
         }
-        
-        for placeholder, value in replacements.items():
-            content = content.replace(placeholder, value)
-        
-        return content
 
     def _format_required_fields(self, fields: List[str]) -> str:
         """Formata lista de campos obrigatórios"""
@@ -488,11 +689,8 @@ class DomainTemplateManager:
         
         return "\n".join(f"- {field}" for field in fields)
 
-    def _format_detailed_steps(self, steps: List[Dict[str, Any]]) -> str:
-        """Formata passos detalhados do processo"""
-        if not steps:
-            return "1. Seguir sequência identificada na análise"
-        
+    def _format_detailed_steps(self, steps: Iterable[Dict[str, Any]]) -> str:
+        """Formata passos detalhados do processo (aceita lista ou gerador)"""
         formatted_steps = []
         for i, step in enumerate(steps, 1):
             action = step.get('action', 'ação')
@@ -505,6 +703,9 @@ class DomainTemplateManager:
             
             formatted_steps.append(step_text)
         
+        if not formatted_steps:
+            return "1. Seguir sequência identificada na análise"
+        
         return "\n".join(formatted_steps)
 
     def get_enhanced_prompt_for_domain(self, 
@@ -543,30 +744,20 @@ class DomainTemplateManager:
         warnings = []
         missing_elements = []
         
-        doc_lower = documentation.lower()
+        # Uma única varredura do documento para regras e elementos esperados
+        found = self._validation_matcher(domain, template).find(documentation.lower())
         
         # Verificar regras de validação
         for rule in template.validation_rules:
-            if rule == "deve_conter_validacao_credenciais":
-                if not any(word in doc_lower for word in ['credenciais', 'usuário', 'senha', 'login']):
-                    warnings.append("Documentação pode não incluir validação adequada de credenciais")
-            
-            elif rule == "deve_incluir_tratamento_erro_login":
-                if not any(word in doc_lower for word in ['erro', 'falha', 'inválido', 'bloqueado']):
-                    warnings.append("Falta tratamento de erros de login")
-            
-            elif rule == "deve_listar_campos_obrigatorios":
-                if not any(word in doc_lower for word in ['obrigatório', 'required', 'necessário']):
-                    warnings.append("Pode não listar campos obrigatórios adequadamente")
-            
-            elif rule == "deve_validar_valores_monetarios":
-                if not any(word in doc_lower for word in ['valor', 'saldo', 'limite', 'validar']):
-                    warnings.append("Falta validação de valores monetários")
+            if rule in _VALIDATION_RULES:
+                words, warning = _VALIDATION_RULES[rule]
+                if not any(word in found for word in words):
+                    warnings.append(warning)
         
         # Verificar elementos esperados
         for element in template.expected_elements:
             element_variations = element.replace('_', ' ').split()
-            if not any(var in doc_lower for var in element_variations):
+            if not any(var in found for var in element_variations):
                 missing_elements.append(element)
         
         is_valid = len(warnings) == 0 and len(missing_elements) < len(template.expected_elements) * 0.5
@@ -579,15 +770,36 @@ class DomainTemplateManager:
             'template_used': template.name
         }
 
+    def _validation_matcher(self, domain: ProcessDomain, template: DomainTemplate) -> _KeywordMatcher:
+        """Matcher com as palavras de validação do template (refeito se o template mudar)"""
+        cached = self._validation_matchers.get(domain)
+        if cached is not None and cached[0] is template:
+            return cached[1]
+        
+        keywords = set()
+        for rule in template.validation_rules:
+            if rule in _VALIDATION_RULES:
+                keywords.update(_VALIDATION_RULES[rule][0])
+        for element in template.expected_elements:
+            keywords.update(element.replace('_', ' ').split())
+        
+        matcher = _KeywordMatcher(keywords)
+        self._validation_matchers[domain] = (template, matcher)
+        return matcher
+
     def get_available_domains(self) -> List[Dict[str, str]]:
         """Retorna lista de domínios disponíveis"""
+        # Padrões na ordem fixa, seguidos dos domínios só importados
+        templates = {domain: self.get_template(domain) for domain in _DEFAULT_TEMPLATE_BUILDERS}
+        templates.update(self.templates)
+        
         return [
             {
                 'domain': domain.value,
                 'name': template.name,
                 'description': template.description
             }
-            for domain, template in self.templates.items()
+            for domain, template in templates.items()
         ]
 
     def export_template(self, domain: ProcessDomain, file_path: str):
@@ -596,6 +808,20 @@ class DomainTemplateManager:
         if not template:
             return False
         
+        try:
+            with open(file_path, 'wb') as f:
+                f.write(self._serialize_template(domain, template))
+            return True
+        except Exception:
+            logger.exception("Erro ao exportar template para %s", file_path)
+            return False
+
+    def _serialize_template(self, domain: ProcessDomain, template: DomainTemplate) -> bytes:
+        """JSON do template, reaproveitado enquanto o template do domínio não for substituído"""
+        cached = self._export_cache.get(domain)
+        if cached is not None and cached[0] is template:
+            return cached[1]
+        
         template_data = {
             'domain': template.domain.value,
             'name': template.name,
@@ -616,29 +842,26 @@ class DomainTemplateManager:
             'complexity_indicators': template.complexity_indicators
         }
         
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(template_data, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception as e:
-            print(f"Erro ao exportar template: {e}")
-            return False
+        data = orjson.dumps(template_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        self._export_cache[domain] = (template, data)
+        return data
 
     def import_template(self, file_path: str) -> bool:
         """Importa template de arquivo JSON"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                template_data = json.load(f)
+            with open(file_path, 'rb') as f:
+                template_data = orjson.loads(f.read())
             
             domain = ProcessDomain(template_data['domain'])
             
+            # Campos na ordem de declaração de TemplateSection
             sections = [
                 TemplateSection(
-                    title=section['title'],
-                    content_template=section['content_template'],
-                    is_required=section['is_required'],
-                    order=section['order'],
-                    conditions=section['conditions']
+                    section['title'],
+                    section['content_template'],
+                    section['is_required'],
+                    section['order'],
+                    section['conditions']
                 )
                 for section in template_data['sections']
             ]
@@ -657,6 +880,6 @@ class DomainTemplateManager:
             self.templates[domain] = template
             return True
             
-        except Exception as e:
-            print(f"Erro ao importar template: {e}")
+        except Exception:
+            logger.exception("Erro ao importar template de %s", file_path)
             return False
\ No newline at end of file
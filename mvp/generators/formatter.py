@@ -4,15 +4,61 @@ from docx.shared import Inches
 from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import re
-from typing import Dict, Any, List, Optional
+import io
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 import os
 from datetime import datetime
 
+_ORDERED_ITEM_RE = re.compile(r'^\d+\.\s+')
+_INLINE_FORMAT_RE = re.compile(r'(\*\*.*?\*\*|\*.*?\*|`.*?`)')
+
+@lru_cache(maxsize=8)
+def _markdown_blocks(content: str) -> Tuple[Tuple[str, Any], ...]:
+    """Classifica as linhas do markdown em blocos (tipo, conteúdo)
+    
+    Reexportar a mesma sessão reaproveita o resultado sem reprocessar o texto.
+    """
+    blocks = []
+    
+    for line in content.split('\n'):
+        line = line.strip()
+        
+        if not line:
+            blocks.append(('blank', None))
+        elif line.startswith('# '):
+            blocks.append(('heading1', line[2:]))
+        elif line.startswith('## '):
+            blocks.append(('heading2', line[3:]))
+        elif line.startswith('### '):
+            blocks.append(('heading3', line[4:]))
+        elif line.startswith('- '):
+            blocks.append(('bullet', line[2:]))
+        elif _ORDERED_ITEM_RE.match(line):
+            blocks.append(('number', _ORDERED_ITEM_RE.sub('', line)))
+        else:
+            blocks.append(('text', tuple(_INLINE_FORMAT_RE.split(line))))
+    
+    return tuple(blocks)
+
 class DocumentFormatter:
     """Formatador para converter documentação gerada em diferentes formatos"""
     
     def __init__(self):
         self.supported_formats = ['markdown', 'docx', 'html', 'txt']
+        # Documento base (template padrão + estilos) serializado uma única vez
+        self._template_bytes = None
+        
+    def _new_docx(self) -> Document:
+        """Cria documento Word a partir do template já estilizado em memória"""
+        if self._template_bytes is None:
+            base = Document()
+            self._setup_docx_styles(base)
+            buffer = io.BytesIO()
+            base.save(buffer)
+            self._template_bytes = buffer.getvalue()
+        
+        return Document(io.BytesIO(self._template_bytes))
         
     def format_as_markdown(self, content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """Formata conteúdo como Markdown (já está neste formato)"""
@@ -104,11 +150,8 @@ class DocumentFormatter:
     def format_as_docx(self, content: str, output_path: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
         """Converte Markdown para documento Word (.docx)"""
         try:
-            # Criar novo documento
-            doc = Document()
-            
-            # Configurar estilos
-            self._setup_docx_styles(doc)
+            # Criar novo documento (estilos já configurados no template)
+            doc = self._new_docx()
             
             # Adicionar metadata se fornecida
             if metadata:
@@ -256,42 +299,38 @@ class DocumentFormatter:
     
     def _parse_markdown_to_docx(self, doc: Document, content: str):
         """Converte conteúdo markdown para elementos do Word"""
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            
-            if not line:
+        for kind, value in _markdown_blocks(content):
+            if kind == 'blank':
                 doc.add_paragraph()  # Linha em branco
-                continue
             
             # Headers
-            if line.startswith('# '):
-                para = doc.add_heading(line[2:], level=1)
-            elif line.startswith('## '):
-                para = doc.add_heading(line[3:], level=2)
-            elif line.startswith('### '):
-                para = doc.add_heading(line[4:], level=3)
+            elif kind == 'heading1':
+                doc.add_heading(value, level=1)
+            elif kind == 'heading2':
+                doc.add_heading(value, level=2)
+            elif kind == 'heading3':
+                doc.add_heading(value, level=3)
             
             # Lista não ordenada
-            elif line.startswith('- '):
-                para = doc.add_paragraph(line[2:], style='List Bullet')
+            elif kind == 'bullet':
+                doc.add_paragraph(value, style='List Bullet')
             
             # Lista ordenada
-            elif re.match(r'^\d+\.\s+', line):
-                text = re.sub(r'^\d+\.\s+', '', line)
-                para = doc.add_paragraph(text, style='List Number')
+            elif kind == 'number':
+                doc.add_paragraph(value, style='List Number')
             
             # Texto normal
             else:
                 para = doc.add_paragraph()
-                self._add_formatted_text(para, line)
+                self._add_formatted_parts(para, value)
     
     def _add_formatted_text(self, paragraph, text: str):
         """Adiciona texto formatado (bold, italic) ao parágrafo"""
         # Processar formatação markdown no texto
-        parts = re.split(r'(\*\*.*?\*\*|\*.*?\*|`.*?`)', text)
-        
+        self._add_formatted_parts(paragraph, _INLINE_FORMAT_RE.split(text))
+    
+    def _add_formatted_parts(self, paragraph, parts):
+        """Adiciona ao parágrafo os trechos já separados pela formatação markdown"""
         for part in parts:
             if part.startswith('**') and part.endswith('**'):
                 # Bold
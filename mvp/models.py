@@ -1,8 +1,71 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
+import orjson
 import uuid
 
-db = SQLAlchemy()
+def json_dumps(obj) -> str:
+    """Serializa JSON com orjson (mais rápido que o json da stdlib)"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+# Colunas JSON codificadas/decodificadas com orjson pelo driver
+db = SQLAlchemy(engine_options={
+    'json_serializer': json_dumps,
+    'json_deserializer': orjson.loads
+})
+
+# PRAGMAs aplicados a cada nova conexão SQLite: WAL + synchronous=NORMAL evitam
+# fsync a cada commit; mmap/cache aceleram as leituras dos endpoints de polling
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "cache_size=-20000"
+)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Aplica SQLITE_PRAGMAS a uma nova conexão"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+def register_sqlite_pragmas():
+    """Registra os PRAGMAs só no engine desta aplicação (não em todo Engine do
+    processo) e só se for SQLite; chamar no contexto da aplicação, antes do create_all"""
+    engine = db.engine
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, "connect", _set_sqlite_pragmas):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
+# JSON nativo (TEXT no SQLite, JSONB no Postgres para permitir índices)
+JSONType = db.JSON().with_variant(JSONB(), 'postgresql')
+
+def upgrade_json_columns():
+    """Converte para JSONB as colunas JSONType de bancos Postgres criados quando elas
+    eram TEXT (o create_all não altera tabelas existentes). Idempotente e sem efeito
+    nos demais bancos; chamar após o create_all, no contexto da aplicação."""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    
+    json_columns = {
+        (table.name, column.name)
+        for table in db.metadata.sorted_tables
+        for column in table.columns
+        if column.type is JSONType
+    }
+    with db.engine.begin() as conn:
+        legacy = conn.execute(text(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND data_type IN ('text', 'json')"
+        )).all()
+        for table_name, column_name in legacy:
+            if (table_name, column_name) in json_columns:
+                conn.execute(text(
+                    f'ALTER TABLE "{table_name}" ALTER COLUMN "{column_name}" '
+                    f'TYPE jsonb USING NULLIF("{column_name}"::text, \'\')::jsonb'
+                ))
 
 class Session(db.Model):
     """Modelo para sessões de processamento"""
@@ -10,17 +73,17 @@ class Session(db.Model):
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     status = db.Column(db.String(20), nullable=False, default='uploading')  # uploading, processing, completed, error
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Arquivos enviados
     transcription_file = db.Column(db.String(255))
-    screenshot_files = db.Column(db.Text)  # JSON list of filenames
+    screenshot_files = db.Column(JSONType)  # lista de caminhos dos screenshots
     transcription_only_mode = db.Column(db.Boolean, default=False, nullable=False)
     
     # Resultados do processamento
-    processed_actions = db.Column(db.Text)  # JSON
-    ocr_results = db.Column(db.Text)  # JSON
+    processed_actions = db.Column(JSONType)
+    ocr_results = db.Column(JSONType)
     generated_documentation = db.Column(db.Text)
     
     # Metadados adicionais para histórico
@@ -28,7 +91,7 @@ class Session(db.Model):
     error_message = db.Column(db.Text)  # Mensagem de erro se houver
     files_count = db.Column(db.Integer, default=0)  # Número total de arquivos processados
     actions_count = db.Column(db.Integer, default=0)  # Número total de ações extraídas
-    ai_config = db.Column(db.Text)  # Configurações de IA em JSON
+    ai_config = db.Column(JSONType)  # Configurações de IA
     
     def to_dict(self):
         """Converte sessão para dicionário para API"""
@@ -43,7 +106,7 @@ class Session(db.Model):
             'files_count': self.files_count,
             'actions_count': self.actions_count,
             'has_transcription': bool(self.transcription_file),
-            'has_screenshots': bool(self.screenshot_files and self.screenshot_files != '[]'),
+            'has_screenshots': bool(self.screenshot_files),
             'has_documentation': bool(self.generated_documentation)
         }
     
@@ -66,6 +129,37 @@ class ProcessedDocument(db.Model):
     def __repr__(self):
         return f'<ProcessedDocument {self.id}>'
 
+class ProcessedAction(db.Model):
+    """Modelo para ações extraídas da transcrição (uma linha por ação)"""
+    __tablename__ = 'processed_actions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(36), db.ForeignKey('sessions.id'), nullable=False, index=True)
+    sequence = db.Column(db.Integer, nullable=False)
+    action_type = db.Column(db.String(20), nullable=False)  # click, type, select, navigate, ...
+    element = db.Column(db.Text)
+    timestamp = db.Column(db.String(20))
+    speaker = db.Column(db.String(100))
+    confidence = db.Column(db.Float)
+    raw_text = db.Column(db.Text)
+    
+    session = db.relationship('Session', backref=db.backref('actions', lazy=True, order_by='ProcessedAction.sequence'))
+    
+    def to_dict(self):
+        """Converte ação para dicionário para API"""
+        return {
+            'action_type': self.action_type,
+            'element': self.element,
+            'sequence': self.sequence,
+            'timestamp': self.timestamp,
+            'speaker': self.speaker,
+            'confidence': self.confidence,
+            'raw_text': self.raw_text
+        }
+    
+    def __repr__(self):
+        return f'<ProcessedAction {self.session_id}#{self.sequence}>'
+
 class ProcessingLog(db.Model):
     """Modelo para logs detalhados de processamento"""
     __tablename__ = 'processing_logs'
@@ -92,4 +186,15 @@ class ProcessingLog(db.Model):
         }
     
     def __repr__(self):
-        return f'<ProcessingLog {self.id} - {self.step}>'
\ No newline at end of file
+        return f'<ProcessingLog {self.id} - {self.step}>'
+
+class OCRCache(db.Model):
+    """Resultados de OCR indexados pelo hash do conteúdo da imagem (reaproveitados entre sessões)"""
+    __tablename__ = 'ocr_cache'
+    
+    image_hash = db.Column(db.String(64), primary_key=True)  # hash do conteúdo + versão do OCR (ocr_cache_key)
+    result = db.Column(JSONType, nullable=False)  # OCRResult serializado
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<OCRCache {self.image_hash}>'
@@ -1,10 +1,48 @@
 import re
-from typing import List, Dict, Any
+from itertools import chain, islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from dataclasses import dataclass
-import webvtt
+import mmap
 import os
+import sys
 
-@dataclass
+# Legenda VTT: linha de tempo "inicio --> fim [ajustes]" seguida das linhas de texto
+_VTT_CUE_RE = re.compile(
+    rb'^((?:\d+:)?\d{2}:\d{2}\.\d{3})[ \t]+-->[ \t]+((?:\d+:)?\d{2}:\d{2}\.\d{3})[^\r\n]*\r?\n'
+    rb'((?:[^\r\n]+(?:\r?\n|\Z))*)',
+    re.MULTILINE
+)
+_VTT_TAG_RE = re.compile(rb'<[^>]*>')
+_VTT_HEADER = b'WEBVTT'
+_UTF8_BOM = b'\xef\xbb\xbf'
+
+def _vtt_timestamp(raw: bytes) -> str:
+    """Normaliza timestamp VTT para HH:MM:SS.mmm"""
+    timestamp = raw.decode('ascii')
+    if timestamp.count(':') == 1:
+        return '00:' + timestamp
+    return timestamp.zfill(12)
+
+def _iter_vtt_cues(file_path: str) -> Iterator[tuple]:
+    """Percorre as legendas do VTT direto do page cache via mmap
+    
+    O arquivo não é lido inteiro para a memória: o regex de bytes varre o mapa
+    e só o texto de cada legenda é decodificado. Gera (inicio, fim, texto).
+    """
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        offset = len(_UTF8_BOM) if buf[:len(_UTF8_BOM)] == _UTF8_BOM else 0
+        if buf[offset:offset + len(_VTT_HEADER)] != _VTT_HEADER:
+            raise ValueError("Arquivo VTT sem cabeçalho WEBVTT")
+        
+        for match in _VTT_CUE_RE.finditer(buf, offset):
+            payload = _VTT_TAG_RE.sub(b'', match.group(3)).replace(b'\r\n', b'\n')
+            yield (
+                _vtt_timestamp(match.group(1)),
+                _vtt_timestamp(match.group(2)),
+                payload.decode('utf-8', 'replace').strip()
+            )
+
+@dataclass(slots=True)
 class Action:
     """Representa uma ação identificada na transcrição"""
     action_type: str  # click, type, select, navigate
@@ -15,7 +53,7 @@ class Action:
     confidence: float # confiança na identificação
     raw_text: str     # texto original
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TranscriptionSegment:
     """Segmento de transcrição com timestamp"""
     timestamp: str
@@ -115,90 +153,126 @@ class BasicTranscriptionParser:
 
     def parse_vtt_file(self, file_path: str) -> List[TranscriptionSegment]:
         """Parse arquivo VTT do Teams"""
-        segments = []
+        return list(self._iter_vtt_segments(file_path))
+
+    def parse_text_file(self, file_path: str) -> List[TranscriptionSegment]:
+        """Parse arquivo de texto simples"""
+        return list(self._iter_text_segments(file_path))
+
+    def iter_segments(self, file_path: str, stats: Optional[Dict[str, Any]] = None) -> Iterator[TranscriptionSegment]:
+        """Gera os segmentos do arquivo sob demanda, sem materializar lista intermediária.
+        
+        Se `stats` for informado, ele é preenchido durante o consumo com
+        'total_segments' e 'speakers' (set), servindo de resumo sem uma segunda passada.
+        """
+        file_extension = os.path.splitext(file_path)[1].lower()
+        
+        if file_extension == '.vtt':
+            source = self._iter_vtt_segments(file_path)
+        else:
+            source = self._iter_text_segments(file_path)
+        
+        if stats is None:
+            yield from source
+            return
+        
+        stats.setdefault('total_segments', 0)
+        speakers = stats.setdefault('speakers', set())
+        for segment in source:
+            stats['total_segments'] += 1
+            speakers.add(segment.speaker)
+            yield segment
+
+    def _iter_vtt_segments(self, file_path: str) -> Iterator[TranscriptionSegment]:
+        """Gera segmentos de um arquivo VTT (fallback para texto se a leitura falhar)"""
+        cues_found = False
         
         try:
-            vtt = webvtt.read(file_path)
-            for caption in vtt:
-                # Extrair speaker se presente no formato "Nome: texto"
-                text = caption.text.strip()
-                speaker = "Unknown"
-                
-                if ':' in text:
-                    parts = text.split(':', 1)
-                    if len(parts) == 2:
-                        potential_speaker = parts[0].strip()
-                        # Verificar se é um nome válido (não muito longo, sem números)
-                        if len(potential_speaker) < 50 and not any(char.isdigit() for char in potential_speaker):
-                            speaker = potential_speaker
-                            text = parts[1].strip()
-                
-                segment = TranscriptionSegment(
-                    timestamp=caption.start,
-                    speaker=speaker,
-                    text=text,
-                    duration=self._calculate_duration(caption.start, caption.end)
-                )
-                segments.append(segment)
-                
-        except Exception as e:
+            for start, end, text in _iter_vtt_cues(file_path):
+                cues_found = True
+                yield self._build_vtt_segment(start, end, text)
+        except (OSError, ValueError) as e:
+            if cues_found:
+                raise
             print(f"Erro ao processar VTT: {e}")
+        
+        if not cues_found:
             # Fallback para processamento como texto
-            return self.parse_text_file(file_path)
-            
-        return segments
+            yield from self._iter_text_segments(file_path)
 
-    def parse_text_file(self, file_path: str) -> List[TranscriptionSegment]:
-        """Parse arquivo de texto simples"""
-        segments = []
+    def _build_vtt_segment(self, start: str, end: str, text: str) -> TranscriptionSegment:
+        """Cria o segmento de uma legenda VTT, separando o speaker do texto"""
+        # Extrair speaker se presente no formato "Nome: texto"
+        text = text.strip()
+        speaker = "Unknown"
         
+        if ':' in text:
+            parts = text.split(':', 1)
+            if len(parts) == 2:
+                potential_speaker = parts[0].strip()
+                # Verificar se é um nome válido (não muito longo, sem números)
+                if len(potential_speaker) < 50 and not any(char.isdigit() for char in potential_speaker):
+                    # Poucos falantes se repetem por milhares de segmentos
+                    speaker = sys.intern(potential_speaker)
+                    text = parts[1].strip()
+        
+        return TranscriptionSegment(
+            timestamp=start,
+            speaker=speaker,
+            text=text,
+            duration=self._calculate_duration(start, end)
+        )
+
+    def _iter_text_segments(self, file_path: str) -> Iterator[TranscriptionSegment]:
+        """Gera segmentos de um arquivo de texto simples, linha a linha"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Dividir por linhas e processar
-            lines = content.split('\n')
-            timestamp_counter = 0
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                speaker = "Unknown"
-                text = line
-                
-                # Tentar extrair speaker
-                if ':' in line:
-                    parts = line.split(':', 1)
-                    if len(parts) == 2:
-                        potential_speaker = parts[0].strip()
-                        if len(potential_speaker) < 50 and not any(char.isdigit() for char in potential_speaker):
-                            speaker = potential_speaker
-                            text = parts[1].strip()
-                
-                segment = TranscriptionSegment(
-                    timestamp=f"00:{timestamp_counter:02d}:00",
-                    speaker=speaker,
-                    text=text
-                )
-                segments.append(segment)
-                timestamp_counter += 1
-                
+            f = open(file_path, 'r', encoding='utf-8')
         except Exception as e:
             print(f"Erro ao processar arquivo de texto: {e}")
+            return
+        
+        with f:
+            timestamp_counter = 0
             
-        return segments
+            try:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                        
+                    speaker = "Unknown"
+                    text = line
+                    
+                    # Tentar extrair speaker
+                    if ':' in line:
+                        parts = line.split(':', 1)
+                        if len(parts) == 2:
+                            potential_speaker = parts[0].strip()
+                            if len(potential_speaker) < 50 and not any(char.isdigit() for char in potential_speaker):
+                                speaker = sys.intern(potential_speaker)
+                                text = parts[1].strip()
+                    
+                    yield TranscriptionSegment(
+                        timestamp=f"00:{timestamp_counter:02d}:00",
+                        speaker=speaker,
+                        text=text
+                    )
+                    timestamp_counter += 1
+            except UnicodeDecodeError as e:
+                print(f"Erro ao processar arquivo de texto: {e}")
 
-    def extract_actions(self, segments: List[TranscriptionSegment]) -> List[Action]:
-        """Extrai ações dos segmentos de transcrição"""
+    def extract_actions(self, segments: Iterable[TranscriptionSegment]) -> List[Action]:
+        """Extrai ações dos segmentos de transcrição (aceita lista ou gerador)"""
         actions = []
         sequence_counter = 1
         
-        # Detectar se é documentação técnica ou transcrição de fala
-        is_technical_doc = self._detect_document_type(segments)
+        # Detectar se é documentação técnica ou transcrição de fala; apenas os
+        # primeiros segmentos são antecipados, o restante é consumido sob demanda
+        segments = iter(segments)
+        head = list(islice(segments, 10))
+        is_technical_doc = self._detect_document_type(head)
         
-        for segment in segments:
+        for segment in chain(head, segments):
             # Limpar texto de ruído
             cleaned_text = self._clean_text(segment.text)
             
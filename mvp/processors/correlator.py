@@ -1,10 +1,36 @@
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 import re
 from difflib import SequenceMatcher
 from mvp.parsers.transcription import Action
 from mvp.processors.ocr import OCRResult, UIElement
 
+# Tabela de remoção de acentos básicos e padrões de limpeza, compilados uma única vez
+_ACCENT_TABLE = str.maketrans({
+    'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a',
+    'é': 'e', 'ê': 'e',
+    'í': 'i', 'î': 'i',
+    'ó': 'o', 'ô': 'o', 'õ': 'o',
+    'ú': 'u', 'û': 'u',
+    'ç': 'c'
+})
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+@lru_cache(maxsize=4096)
+def _normalize(text: str) -> str:
+    """Normaliza texto para comparação (memoizado: o mesmo texto de OCR é
+    comparado contra todas as ações da sessão)"""
+    # Converter para minúsculas e remover acentos básicos
+    text = text.lower().translate(_ACCENT_TABLE)
+    
+    # Remover pontuação e caracteres especiais
+    text = _PUNCTUATION_RE.sub(' ', text)
+    
+    # Remover espaços múltiplos
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
 @dataclass
 class CorrelatedEvent:
     """Evento correlacionado entre áudio e visual"""
@@ -30,6 +56,14 @@ class CorrelatedProcess:
 class BasicCorrelator:
     """Correlacionador básico entre transcrições e screenshots"""
     
+    # Tipos de elemento UI compatíveis com cada tipo de ação
+    COMPATIBLE_UI_TYPES = {
+        'click': frozenset(('button', 'link', 'checkbox', 'menu')),
+        'type': frozenset(('field', 'input')),
+        'select': frozenset(('menu', 'dropdown', 'checkbox')),
+        'navigate': frozenset(('link', 'button', 'menu'))
+    }
+    
     def __init__(self):
         # Thresholds para correlação
         self.min_correlation_score = 0.5
@@ -109,7 +143,7 @@ class BasicCorrelator:
         for ocr_result in ocr_results:
             # Tentar matching direto com elementos UI
             for ui_element in ocr_result.ui_elements:
-                score, method = self._calculate_element_match_score(action, ui_element)
+                score, method = self._calculate_element_match_score(action, ui_element, best_score)
                 
                 if score > best_score and score >= self.min_correlation_score:
                     best_score = score
@@ -133,8 +167,15 @@ class BasicCorrelator:
         
         return best_match
 
-    def _calculate_element_match_score(self, action: Action, ui_element: UIElement) -> Tuple[float, str]:
-        """Calcula score de correspondência entre ação e elemento UI"""
+    def _calculate_element_match_score(self,
+                                       action: Action,
+                                       ui_element: UIElement,
+                                       best_score: float = 0.0) -> Tuple[float, str]:
+        """Calcula score de correspondência entre ação e elemento UI
+        
+        Se o limite superior do score não supera `best_score`, o cálculo
+        completo é evitado e retorna 0.0 (o elemento não seria escolhido).
+        """
         score = 0.0
         method = "element_match"
         
@@ -146,12 +187,19 @@ class BasicCorrelator:
         if action_element == ui_text:
             return 1.0, "exact_match"
         
+        action_type_score = self._match_action_to_ui_type(action.action_type, ui_element.type)
+        
+        # Poda: quick_ratio() é um limite superior barato de ratio() e as palavras-chave valem no máximo 0.2
+        matcher = SequenceMatcher(None, action_element, ui_text)
+        upper_bound = matcher.quick_ratio() * 0.6 + action_type_score * 0.2 + 0.2 + ui_element.confidence * 0.1
+        if upper_bound <= best_score:
+            return 0.0, method
+        
         # 2. Correspondência parcial usando SequenceMatcher
-        similarity = SequenceMatcher(None, action_element, ui_text).ratio()
+        similarity = matcher.ratio()
         score += similarity * 0.6
         
         # 3. Verificar se tipo de ação combina com tipo de elemento
-        action_type_score = self._match_action_to_ui_type(action.action_type, ui_element.type)
         score += action_type_score * 0.2
         
         # 4. Verificar palavras-chave comuns
@@ -178,7 +226,7 @@ class BasicCorrelator:
         else:
             # Buscar por palavras individuais
             action_words = action_element.split()
-            text_words = text_normalized.split()
+            text_words = set(text_normalized.split())
             
             matches = sum(1 for word in action_words if word in text_words and len(word) > 2)
             if len(action_words) > 0:
@@ -190,14 +238,7 @@ class BasicCorrelator:
 
     def _match_action_to_ui_type(self, action_type: str, ui_type: str) -> float:
         """Verifica se tipo de ação combina com tipo de elemento UI"""
-        compatibility_matrix = {
-            'click': ['button', 'link', 'checkbox', 'menu'],
-            'type': ['field', 'input'],
-            'select': ['menu', 'dropdown', 'checkbox'],
-            'navigate': ['link', 'button', 'menu']
-        }
-        
-        compatible_types = compatibility_matrix.get(action_type, [])
+        compatible_types = self.COMPATIBLE_UI_TYPES.get(action_type, ())
         return 1.0 if ui_type in compatible_types else 0.3
 
     def _match_keywords(self, text1: str, text2: str) -> float:
@@ -221,28 +262,7 @@ class BasicCorrelator:
 
     def _normalize_text(self, text: str) -> str:
         """Normaliza texto para comparação"""
-        # Converter para minúsculas
-        text = text.lower()
-        
-        # Remover acentos básicos
-        replacements = {
-            'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a',
-            'é': 'e', 'ê': 'e',
-            'í': 'i', 'î': 'i',
-            'ó': 'o', 'ô': 'o', 'õ': 'o',
-            'ú': 'u', 'û': 'u',
-            'ç': 'c'
-        }
-        for accented, plain in replacements.items():
-            text = text.replace(accented, plain)
-        
-        # Remover pontuação e caracteres especiais
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # Remover espaços múltiplos
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        return _normalize(text)
 
     def _extract_relevant_text(self, element_name: str, full_text: str) -> str:
         """Extrai texto relevante baseado no nome do elemento"""
@@ -5,14 +5,33 @@ except ImportError:
     TESSERACT_AVAILABLE = False
     print("⚠️ Tesseract não está disponível. Usando OCR alternativo.")
 
+try:
+    from tesserocr import PyTessBaseAPI
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+try:
+    from paddleocr import PaddleOCR
+    PADDLEOCR_AVAILABLE = True
+except ImportError:
+    PADDLEOCR_AVAILABLE = False
+
 from PIL import Image, ImageEnhance, ImageFilter
 import numpy as np
 import re
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
+from contextlib import contextmanager
+import logging
+import queue
+import threading
+import weakref
 import os
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+@dataclass(slots=True)
 class UIElement:
     """Representa um elemento de interface identificado"""
     type: str           # button, field, menu, link, etc.
@@ -21,7 +40,7 @@ class UIElement:
     position: tuple    # (x, y, width, height) se disponível
     context: str       # contexto ao redor do elemento
 
-@dataclass
+@dataclass(slots=True)
 class OCRResult:
     """Resultado do processamento OCR"""
     original_image_path: str
@@ -30,13 +49,75 @@ class OCRResult:
     ui_elements: List[UIElement]
     preprocessing_applied: List[str]
     processing_time: float
+    from_engine: bool = False  # True se o texto veio de um OCR real (não do fallback simulado)
+
+def ocr_result_from_dict(data: Dict[str, Any], image_path: Optional[str] = None) -> OCRResult:
+    """Reconstrói OCRResult a partir do dicionário serializado (ex.: cache de OCR)"""
+    return OCRResult(
+        original_image_path=image_path or data['original_image_path'],
+        extracted_text=data['extracted_text'],
+        confidence=data['confidence'],
+        ui_elements=[
+            UIElement(
+                type=element['type'],
+                text=element['text'],
+                confidence=element['confidence'],
+                position=tuple(element['position']) if element['position'] is not None else None,
+                context=element['context']
+            )
+            for element in data['ui_elements']
+        ],
+        preprocessing_applied=list(data['preprocessing_applied']),
+        processing_time=data['processing_time'],
+        from_engine=data.get('from_engine', False)
+    )
+
+def _end_tess_apis(apis: List[Any], idle: "queue.SimpleQueue"):
+    """Libera os handles do Tesseract (chamado por close() ou na coleta/saída)"""
+    while not idle.empty():
+        idle.get_nowait()
+    while apis:
+        apis.pop().End()
 
 class BasicOCR:
     """OCR básico usando Tesseract para extração de texto de screenshots"""
     
-    def __init__(self):
-        # Configuração do Tesseract para português
-        self.tesseract_config = r'--oem 3 --psm 6 -l por'
+    # Limites da política de junção de caixas adjacentes (PaddleOCR), em pixels
+    MERGE_MAX_VERTICAL_GAP = 15
+    MERGE_MAX_HORIZONTAL_GAP = 100
+    
+    # Maior dimensão (em pixels) enviada ao OCR; screenshots maiores (ex.: 4K) são reduzidos
+    MAX_OCR_DIMENSION = 1800
+    
+    # Tamanho mínimo para o OCR; imagens menores são ampliadas (o limite máximo prevalece)
+    MIN_OCR_WIDTH = 800
+    MIN_OCR_HEIGHT = 600
+    
+    # Recortes de texto reconhecidos por lote no PaddleOCR (padrão da biblioteca: 6)
+    PADDLE_REC_BATCH_NUM = 32
+    
+    # Incrementar quando o pipeline de OCR mudar de forma que invalide resultados já em cache
+    OCR_PIPELINE_VERSION = 2
+    
+    def __init__(self, backend: str = "tesserocr", lang: str = "por"):
+        # Configuração do Tesseract (padrão: português)
+        self.lang = lang
+        self.tesseract_config = f'--oem 3 --psm 6 -l {lang}'
+        
+        # Backend de OCR: tesserocr (API C++ em processo), paddleocr ou pytesseract
+        self.backend = self._resolve_backend(backend)
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        
+        # tesserocr: pool de handles (a API não é reentrante, mas handles distintos
+        # rodam em paralelo); cada thread usa um handle por vez e o devolve ao pool
+        self._tess_idle = queue.SimpleQueue()
+        self._tess_apis = []
+        self._tess_finalizer = weakref.finalize(self, _end_tess_apis, self._tess_apis, self._tess_idle)
+        
+        if self.backend == "paddleocr":
+            self._engine = PaddleOCR(use_angle_cls=True, lang='pt', show_log=False,
+                                     rec_batch_num=self.PADDLE_REC_BATCH_NUM)
         
         # Palavras-chave para identificar tipos de elementos UI
         self.ui_keywords = {
@@ -68,32 +149,63 @@ class BasicOCR:
             ]
         }
 
+    @property
+    def cache_version(self) -> str:
+        """Identifica backend e configuração: resultados em cache só valem para a mesma versão"""
+        return f"{self.OCR_PIPELINE_VERSION}:{self.backend}:{self.lang}:{self.MAX_OCR_DIMENSION}"
+
+    def _resolve_backend(self, backend: str) -> str:
+        """Escolhe o backend solicitado, recorrendo ao pytesseract se indisponível"""
+        backend = (backend or "pytesseract").lower()
+        
+        if backend == "tesserocr" and TESSEROCR_AVAILABLE:
+            return "tesserocr"
+        if backend == "paddleocr" and PADDLEOCR_AVAILABLE:
+            return "paddleocr"
+        return "pytesseract"
+
     def extract_text(self, image_path: str) -> OCRResult:
         """Extrai texto de uma imagem usando OCR"""
         start_time = self._get_time()
         preprocessing_steps = []
         
         try:
-            # Carregar imagem
-            image = Image.open(image_path)
+            # Carregar imagem já na escala do OCR (reduzida ou ampliada uma única vez)
+            image, scale = self._load_image(image_path)
+            downscaled = scale < 1
             original_image = image.copy()
             
             # Pré-processamento para melhorar OCR
             processed_image, steps = self._preprocess_image(image)
+            if scale != 1:
+                direction = 'downscale' if downscaled else 'resize'
+                steps.insert(0, f'{direction}_to_{image.size[0]}x{image.size[1]}')
             preprocessing_steps = steps
             
-            # Extrair texto usando método disponível
-            if TESSERACT_AVAILABLE:
+            # Extrair texto: backend em processo, depois pytesseract e, por último,
+            # o fallback simulado
+            from_engine = False
+            if self.backend != "pytesseract":
+                try:
+                    # PaddleOCR lê o arquivo original; se houve redução, recebe o array (BGR) reduzido
+                    source = np.asarray(image.convert('RGB'))[:, :, ::-1] if downscaled else image_path
+                    extracted_text, confidence = self._run_engine(processed_image, source)
+                    from_engine = True
+                except Exception as engine_error:
+                    logger.warning("Erro no backend %s para %s: %s", self.backend, image_path, engine_error)
+            
+            if not from_engine and TESSERACT_AVAILABLE:
                 try:
                     extracted_text = pytesseract.image_to_string(
                         processed_image, 
                         config=self.tesseract_config
                     )
                     confidence = self._calculate_overall_confidence(processed_image)
+                    from_engine = True
                 except Exception as tesseract_error:
-                    print(f"⚠️ Erro no Tesseract: {tesseract_error}")
-                    extracted_text, confidence = self._fallback_ocr(processed_image, image_path)
-            else:
+                    logger.warning("Erro no Tesseract para %s: %s", image_path, tesseract_error)
+            
+            if not from_engine:
                 extracted_text, confidence = self._fallback_ocr(processed_image, image_path)
             
             # Identificar elementos UI
@@ -107,7 +219,8 @@ class BasicOCR:
                 confidence=confidence,
                 ui_elements=ui_elements,
                 preprocessing_applied=preprocessing_steps,
-                processing_time=processing_time
+                processing_time=processing_time,
+                from_engine=from_engine
             )
             
         except Exception as e:
@@ -124,6 +237,109 @@ class BasicOCR:
                 processing_time=self._get_time() - start_time
             )
 
+    def extract_text_batch(self, image_paths: List[str]) -> List[OCRResult]:
+        """Extrai texto de várias imagens reutilizando o mesmo engine (ordem preservada)"""
+        return [self.extract_text(image_path) for image_path in image_paths]
+
+    def _ocr_scale(self, width: int, height: int) -> float:
+        """Fator único de escala: amplia até MIN_OCR_WIDTH x MIN_OCR_HEIGHT e limita a
+        maior dimensão a MAX_OCR_DIMENSION (o limite máximo prevalece)"""
+        scale = max(1.0, self.MIN_OCR_WIDTH / width, self.MIN_OCR_HEIGHT / height)
+        return min(scale, self.MAX_OCR_DIMENSION / max(width, height))
+
+    def _load_image(self, image_path: str) -> tuple[Image.Image, float]:
+        """Abre a imagem e a redimensiona uma única vez para a escala do OCR
+        
+        O custo do OCR cresce com a área; reduzir screenshots grandes preserva
+        a legibilidade do texto, e imagens pequenas são ampliadas. Para JPEG,
+        draft() decodifica direto em escala reduzida, evitando carregar a imagem
+        em resolução cheia. Retorna (imagem, fator de escala aplicado).
+        """
+        image = Image.open(image_path)
+        width, height = image.size
+        scale = self._ocr_scale(width, height)
+        
+        if scale == 1:
+            return image, 1.0
+        
+        new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if scale < 1 and image.format == 'JPEG':
+            image.draft('RGB', new_size)
+        return image.resize(new_size, Image.Resampling.LANCZOS), scale
+
+    def _run_engine(self, image: Image.Image, image_path) -> tuple[str, float]:
+        """Executa o backend em processo (tesserocr ou PaddleOCR)"""
+        if self.backend == "tesserocr":
+            with self._borrow_tess_api() as api:
+                api.SetImage(image)
+                text = api.GetUTF8Text()
+                confidences = [conf for conf in api.AllWordConfidences() if conf > 0]
+            
+            confidence = (sum(confidences) / len(confidences)) / 100.0 if confidences else 0.3
+            return text, confidence
+        
+        # PaddleOCR trabalha com a imagem original (detecção + reconhecimento)
+        with self._engine_lock:
+            result = self._engine.ocr(image_path, cls=True)
+        
+        boxes = []
+        for line in (result[0] if result else None) or []:
+            points, (text, score) = line
+            xs = [point[0] for point in points]
+            ys = [point[1] for point in points]
+            boxes.append({
+                'text': text,
+                'confidence': float(score),
+                'left': min(xs),
+                'top': min(ys),
+                'right': max(xs)
+            })
+        
+        blocks = self._merge_adjacent_boxes(boxes)
+        if not blocks:
+            return "", 0.3
+        
+        confidence = sum(block['confidence'] for block in blocks) / len(blocks)
+        return "\n".join(block['text'] for block in blocks), confidence
+
+    @contextmanager
+    def _borrow_tess_api(self):
+        """Empresta um handle ocioso do pool (ou cria um novo) durante o OCR de uma imagem"""
+        try:
+            api = self._tess_idle.get_nowait()
+        except queue.Empty:
+            # PSM 6 = bloco uniforme de texto, igual à configuração do pytesseract
+            api = PyTessBaseAPI(lang=self.lang, psm=6)
+            with self._engine_lock:
+                self._tess_apis.append(api)
+        try:
+            yield api
+        finally:
+            self._tess_idle.put(api)
+
+    def close(self):
+        """Libera os handles do Tesseract criados por este processador"""
+        self._tess_finalizer()
+
+    def _merge_adjacent_boxes(self, boxes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Junta caixas de texto vizinhas na mesma linha em blocos contínuos"""
+        blocks = []
+        
+        for box in sorted(boxes, key=lambda b: (b['top'], b['left'])):
+            for block in blocks:
+                same_line = abs(box['top'] - block['top']) <= self.MERGE_MAX_VERTICAL_GAP
+                close_enough = 0 <= box['left'] - block['right'] <= self.MERGE_MAX_HORIZONTAL_GAP
+                if same_line and close_enough:
+                    block['text'] += " " + box['text']
+                    block['right'] = max(block['right'], box['right'])
+                    block['confidence'] = (block['confidence'] * block['count'] + box['confidence']) / (block['count'] + 1)
+                    block['count'] += 1
+                    break
+            else:
+                blocks.append({**box, 'count': 1})
+        
+        return blocks
+
     def _preprocess_image(self, image: Image.Image) -> tuple[Image.Image, List[str]]:
         """Aplica pré-processamento para melhorar qualidade do OCR"""
         steps = []
@@ -134,14 +350,6 @@ class BasicOCR:
             processed = processed.convert('RGB')
             steps.append('convert_to_rgb')
         
-        # Redimensionar se muito pequena
-        width, height = processed.size
-        if width < 800 or height < 600:
-            scale_factor = max(800/width, 600/height)
-            new_size = (int(width * scale_factor), int(height * scale_factor))
-            processed = processed.resize(new_size, Image.Resampling.LANCZOS)
-            steps.append(f'resize_to_{new_size[0]}x{new_size[1]}')
-        
         # Melhorar contraste
         enhancer = ImageEnhance.Contrast(processed)
         processed = enhancer.enhance(1.2)
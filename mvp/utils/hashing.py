@@ -0,0 +1,20 @@
+"""
+Hash do conteúdo de arquivos (deduplicação de screenshots e cache de OCR)
+"""
+
+import hashlib
+
+# BLAKE3 (SIMD) é opcional; sem ele, BLAKE2b com digest de 256 bits
+try:
+    from blake3 import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+def _blake2b_256():
+    return hashlib.blake2b(digest_size=32)
+
+def file_digest(path: str) -> str:
+    """Hash hexadecimal do conteúdo do arquivo (BLAKE3 se instalado, senão BLAKE2b-256)"""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, blake3 if BLAKE3_AVAILABLE else _blake2b_256).hexdigest()
@@ -2,10 +2,89 @@
 Helper para logging detalhado de sessões
 """
 
-import json
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any
-from ..models import db, ProcessingLog
+from ..models import db, ProcessingLog, json_dumps
+
+# Gravação assíncrona: os logs são enfileirados e uma única thread os grava
+# em lote (até LOG_BATCH_SIZE entradas ou LOG_FLUSH_INTERVAL segundos por commit)
+LOG_BATCH_SIZE = 500
+LOG_FLUSH_INTERVAL = 0.5
+
+_log_queue = queue.Queue()
+_log_writer = None
+_log_writer_pid = None
+
+logger = logging.getLogger(__name__)
+
+def start_log_writer(app):
+    """Inicia a thread de gravação de logs em lote (uma vez por processo)"""
+    global _log_writer, _log_writer_pid
+    if _log_writer_active():
+        return
+    
+    _log_writer = threading.Thread(target=_drain_logs, args=(app,), name='mvp-log-writer', daemon=True)
+    _log_writer_pid = os.getpid()
+    _log_writer.start()
+    atexit.register(flush_logs, app)
+
+def _log_writer_active() -> bool:
+    """A thread de gravação existe neste processo? (threads não sobrevivem a um fork)"""
+    return _log_writer is not None and _log_writer_pid == os.getpid()
+
+def _reset_after_fork():
+    """No processo filho (ex.: work-horse do RQ) a thread não existe: grava na hora"""
+    global _log_queue, _log_writer, _log_writer_pid
+    _log_queue = queue.Queue()
+    _log_writer = None
+    _log_writer_pid = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def flush_logs(app):
+    """Grava imediatamente os logs ainda pendentes na fila"""
+    batch = []
+    while True:
+        try:
+            batch.append(_log_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _write_batch(app, batch)
+
+def _drain_logs(app):
+    """Consome a fila agrupando entradas próximas em um único commit"""
+    while True:
+        batch = [_log_queue.get()]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        
+        while len(batch) < LOG_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_log_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        
+        _write_batch(app, batch)
+
+def _write_batch(app, batch):
+    """Insere um lote de logs em uma única transação"""
+    try:
+        with app.app_context():
+            db.session.bulk_insert_mappings(ProcessingLog, batch)
+            db.session.commit()
+    except Exception:
+        # Não queremos que erros de logging quebrem o processamento
+        logger.exception("Erro ao salvar %d logs", len(batch))
 
 class SessionLogger:
     """Logger para sessões de processamento"""
@@ -24,15 +103,21 @@ class SessionLogger:
             details: Detalhes adicionais em formato dict
         """
         try:
-            log_entry = ProcessingLog(
-                session_id=self.session_id,
-                level=level.upper(),
-                step=step,
-                message=message,
-                details=json.dumps(details) if details else None
-            )
+            log_entry = {
+                'session_id': self.session_id,
+                'timestamp': datetime.utcnow(),
+                'level': level.upper(),
+                'step': step,
+                'message': message,
+                'details': json_dumps(details) if details else None
+            }
+            
+            if _log_writer_active():
+                _log_queue.put(log_entry)
+                return
             
-            db.session.add(log_entry)
+            # Sem thread de gravação (ex.: scripts), grava na hora
+            db.session.add(ProcessingLog(**log_entry))
             db.session.commit()
             
         except Exception as e:
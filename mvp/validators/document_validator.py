@@ -7,8 +7,10 @@ import re
 from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
-import json
 import os
+import hashlib
+import tempfile
+import orjson
 from datetime import datetime
 
 from mvp.parsers.transcription import Action
@@ -584,7 +586,11 @@ class DocumentValidator:
         return fixed_doc
 
     def export_validation_report(self, report: ValidationReport, output_path: str) -> bool:
-        """Exporta relatório de validação para arquivo"""
+        """Exporta relatório de validação para arquivo
+        
+        Se o arquivo já existe com o mesmo conteúdo (o hash ignora o timestamp),
+        ele é mantido como está, com o validation_timestamp da gravação anterior.
+        """
         try:
             report_data = {
                 'document_id': report.document_id,
@@ -609,8 +615,40 @@ class DocumentValidator:
                 'auto_fixes_applied': report.auto_fixes_applied
             }
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(report_data, f, indent=2, ensure_ascii=False)
+            # Hash do conteúdo (sem o timestamp) guardado ao lado do relatório:
+            # reprocessamentos com resultado idêntico não regravam o arquivo
+            content_digest = hashlib.blake2b(
+                orjson.dumps({k: v for k, v in report_data.items() if k != 'validation_timestamp'},
+                             option=orjson.OPT_NON_STR_KEYS),
+                digest_size=16
+            ).hexdigest()
+            digest_path = output_path + '.sha'
+            
+            if os.path.exists(output_path):
+                try:
+                    with open(digest_path, 'r', encoding='utf-8') as f:
+                        if f.read().strip() == content_digest:
+                            return True
+                except OSError:
+                    pass
+            
+            # Grava em arquivo temporário exclusivo e troca atomicamente: leitores
+            # (ex.: /validation) nunca veem um relatório pela metade e exportações
+            # simultâneas do mesmo relatório não compartilham o temporário
+            with tempfile.NamedTemporaryFile(
+                'wb', dir=os.path.dirname(output_path) or '.', prefix=os.path.basename(output_path) + '.',
+                suffix='.tmp', delete=False
+            ) as f:
+                tmp_path = f.name
+                f.write(orjson.dumps(report_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            try:
+                os.replace(tmp_path, output_path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+            
+            with open(digest_path, 'w', encoding='utf-8') as f:
+                f.write(content_digest)
             
             return True
             
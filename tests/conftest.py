@@ -0,0 +1,33 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Banco em memória: as apps criam as tabelas ao serem importadas
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+os.environ['FLASK_ENV'] = 'testing'
+
+def _import_app(name, tmp_path_factory):
+    """Importa a app num diretório temporário (pastas de dados e logs são criadas no cwd)"""
+    pytest.importorskip("flask_sqlalchemy")
+    pytest.importorskip("PIL")
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp(name))
+    try:
+        return pytest.importorskip(name)
+    finally:
+        os.chdir(cwd)
+
+@pytest.fixture(scope="session")
+def stable_app(tmp_path_factory):
+    """Módulo app.py (versão estável)"""
+    return _import_app("app", tmp_path_factory)
+
+@pytest.fixture(scope="session")
+def full_app(tmp_path_factory):
+    """Módulo app_original_backup.py (versão completa)"""
+    return _import_app("app_original_backup", tmp_path_factory)
@@ -0,0 +1,89 @@
+"""Cache de OCR por conteúdo da versão estável (app.run_cached_ocr)"""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("numpy")
+
+from mvp.processors.ocr import OCRResult
+
+class FakeOCR:
+    """Substitui run_ocr e o processador: registra as imagens enviadas ao OCR"""
+
+    def __init__(self):
+        self.calls = []
+        self.from_engine = True
+        self.cache_version = "v1"
+
+    def __call__(self, paths):
+        self.calls.append(list(paths))
+        return [
+            OCRResult(
+                original_image_path=path,
+                extracted_text=Path(path).read_text(),
+                confidence=0.9,
+                ui_elements=[],
+                preprocessing_applied=[],
+                processing_time=0.0,
+                from_engine=self.from_engine
+            )
+            for path in paths
+        ]
+
+@pytest.fixture
+def fake_ocr(stable_app, monkeypatch):
+    fake = FakeOCR()
+    monkeypatch.setattr(stable_app, "run_ocr", fake)
+    monkeypatch.setattr(stable_app, "get_ocr_processor", lambda: fake)
+    with stable_app.app.app_context():
+        yield fake
+        # Entradas gravadas pelo teste não são confirmadas
+        stable_app.db.session.rollback()
+
+def _screenshots(tmp_path, **contents):
+    paths = []
+    for name, text in contents.items():
+        path = tmp_path / f"{name}.png"
+        path.write_text(text)
+        paths.append(str(path))
+    return paths
+
+def test_identical_content_is_processed_once_and_then_cached(stable_app, fake_ocr, tmp_path):
+    paths = _screenshots(tmp_path, a="Salvar", b="Salvar", c="Cancelar")
+
+    first = stable_app.run_cached_ocr(paths)
+    second = stable_app.run_cached_ocr(paths)
+
+    assert len(fake_ocr.calls[0]) == 2
+    assert fake_ocr.calls[1] == []
+    for results in (first, second):
+        assert [result.original_image_path for result in results] == paths
+        assert [result.extracted_text for result in results] == ["Salvar", "Salvar", "Cancelar"]
+
+def test_fallback_results_are_not_cached(stable_app, fake_ocr, tmp_path):
+    paths = _screenshots(tmp_path, a="texto simulado")
+    fake_ocr.from_engine = False
+
+    stable_app.run_cached_ocr(paths)
+    stable_app.run_cached_ocr(paths)
+
+    assert fake_ocr.calls == [paths, paths]
+
+def test_empty_results_are_not_cached(stable_app, fake_ocr, tmp_path):
+    paths = _screenshots(tmp_path, a="")
+
+    stable_app.run_cached_ocr(paths)
+    stable_app.run_cached_ocr(paths)
+
+    assert fake_ocr.calls == [paths, paths]
+
+def test_cache_is_keyed_by_ocr_version(stable_app, fake_ocr, tmp_path):
+    paths = _screenshots(tmp_path, a="Salvar")
+
+    stable_app.run_cached_ocr(paths)
+    fake_ocr.cache_version = "v2"
+    stable_app.run_cached_ocr(paths)
+
+    assert fake_ocr.calls == [paths, paths]
@@ -0,0 +1,97 @@
+"""Limite do prompt pela janela de contexto do modelo (AIDocumentGenerator)"""
+
+import logging
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("numpy")
+
+from mvp.generators import ai_client
+from mvp.generators.ai_client import AIDocumentGenerator
+from mvp.parsers.transcription import Action
+from mvp.processors.correlator import CorrelatedEvent, CorrelatedProcess
+
+MODEL = "test-model"
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setattr(AIDocumentGenerator, "_initialize_client", lambda self: None)
+    monkeypatch.setattr(AIDocumentGenerator, "_cache_dir", None)
+    gen = AIDocumentGenerator(api_key="test", model=MODEL)
+    gen.sent_prompts = []
+
+    def fake_completion(system_prompt, user_prompt, token_usage):
+        gen.sent_prompts.append(user_prompt)
+        yield "# Documento\n## Objetivo\nx\n## Pré-requisitos\n- a\n## Passos Detalhados\n1. a\n"
+
+    gen._iter_completion = fake_completion
+    return gen
+
+def _process(actions=300, screens=100):
+    events = [
+        CorrelatedEvent(
+            action=Action("click", f"Botão {i}", i, "00:00", "Ana", 0.9, f"clico no botão {i}"),
+            ocr_result=None,
+            matched_ui_element=None,
+            correlation_score=0.0,
+            correlation_method="none",
+            timestamp_diff=0.0,
+            notes=""
+        )
+        for i in range(actions)
+    ]
+    return CorrelatedProcess(
+        session_id="s",
+        correlated_events=events,
+        transcription_summary={'speakers': ['Ana'], 'action_types': ['click'], 'average_confidence': 0.9},
+        ocr_summary=[{'ui_elements_count': 3, 'ui_elements_types': ['button']}] * screens,
+        correlation_quality=0.0,
+        total_actions=actions,
+        successfully_correlated=0
+    )
+
+def _prompt_tokens(gen, user_prompt):
+    return gen.estimate_tokens(gen.base_prompt) + gen.estimate_tokens(user_prompt)
+
+def test_context_limit_lookup():
+    assert ai_client._context_limit("gpt-4") == 8192
+    assert ai_client._context_limit("gpt-4o-2024-08-06") == ai_client.MODEL_CONTEXT_LIMITS["gpt-4o"]
+    assert ai_client._context_limit("modelo-desconhecido") == ai_client.DEFAULT_CONTEXT_LIMIT
+
+def test_screens_are_capped_in_prompt(generator):
+    prompt = generator._build_contextualized_prompt(_process(screens=100))
+
+    assert prompt.count("Tela ") == ai_client.PROMPT_HEAD_SCREENS + ai_client.PROMPT_TAIL_SCREENS
+    assert "telas intermediárias omitidas" in prompt
+
+def test_prompt_within_limit_is_sent_unchanged(generator, monkeypatch):
+    monkeypatch.setitem(ai_client.MODEL_CONTEXT_LIMITS, MODEL, ai_client.DEFAULT_CONTEXT_LIMIT)
+    process = _process()
+
+    result = generator.generate_documentation(process)
+
+    assert result.success
+    assert generator.sent_prompts == [generator._build_contextualized_prompt(process)]
+
+def test_oversized_prompt_is_shrunk(generator, monkeypatch, caplog):
+    process = _process()
+    shrunk = generator._build_contextualized_prompt(process, shrink=2)
+    monkeypatch.setitem(ai_client.MODEL_CONTEXT_LIMITS, MODEL,
+                        _prompt_tokens(generator, shrunk) + generator.max_tokens)
+
+    with caplog.at_level(logging.WARNING, logger=ai_client.__name__):
+        result = generator.generate_documentation(process)
+
+    assert result.success
+    assert generator.sent_prompts == [shrunk]
+    assert "encurtando" in caplog.text
+
+def test_prompt_that_never_fits_is_refused(generator, monkeypatch):
+    monkeypatch.setitem(ai_client.MODEL_CONTEXT_LIMITS, MODEL, generator.max_tokens + 10)
+
+    result = generator.generate_documentation(_process())
+
+    assert not result.success
+    assert "Prompt muito grande" in result.error_message
+    assert generator.sent_prompts == []
@@ -0,0 +1,56 @@
+"""Respostas condicionais (304) do polling de /status da versão completa"""
+
+import pytest
+
+@pytest.fixture
+def status_client(full_app):
+    app = full_app.app
+    with app.app_context():
+        session = full_app.Session(status='processing')
+        full_app.db.session.add(session)
+        full_app.db.session.commit()
+        session_id = session.id
+
+    yield app.test_client(), session_id
+
+    with app.app_context():
+        full_app.db.session.delete(full_app.db.session.get(full_app.Session, session_id))
+        full_app.db.session.commit()
+
+def test_status_sets_validators(status_client):
+    client, session_id = status_client
+
+    response = client.get(f'/status/{session_id}')
+
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+def test_status_unchanged_returns_304(status_client):
+    client, session_id = status_client
+    first = client.get(f'/status/{session_id}')
+
+    by_etag = client.get(f'/status/{session_id}', headers={'If-None-Match': first.headers['ETag']})
+    by_date = client.get(f'/status/{session_id}', headers={'If-Modified-Since': first.headers['Last-Modified']})
+
+    assert by_etag.status_code == 304
+    assert by_date.status_code == 304
+    assert by_etag.data == b''
+
+def test_status_change_invalidates_etag(full_app, status_client):
+    client, session_id = status_client
+    etag = client.get(f'/status/{session_id}').headers['ETag']
+
+    with full_app.app.app_context():
+        full_app.db.session.get(full_app.Session, session_id).status = 'completed'
+        full_app.db.session.commit()
+
+    response = client.get(f'/status/{session_id}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'completed'
+
+def test_status_unknown_session_returns_404(status_client):
+    client, _ = status_client
+
+    assert client.get('/status/inexistente').status_code == 404